@@ -1,24 +1,179 @@
+"""
+Admin changelists sized for tables with millions of rows:
+
+* list_select_related joins the relations shown in list_display instead of
+  fetching them one row at a time.
+* EstimatedCountPaginator takes an unfiltered changelist's row count from
+  the database's statistics rather than a full COUNT(*), and
+  show_full_result_count is off so filtered pages count only once.
+* ordering and sortable_by stick to indexed columns, with the primary key
+  as tie-breaker, so every page is an index range scan.
+* Searches are index lookups: full-text for questions (core.search) and
+  exact matches on indexed columns elsewhere, never icontains.
+* Bulk actions are single set-based UPDATE/DELETE statements.
+"""
+from functools import partial
+
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.utils.functional import cached_property
+
+from . import directory, summary
+from .models import PublicQuestion, LawyerProfile, CustomerProfile, VerificationToken, OutboundEmail, Specialty
+from .search import search_questions
+
+# Below this many rows an exact COUNT(*) is cheap enough to run.
+EXACT_COUNT_THRESHOLD = 10000
+# Most matches a changelist search returns.
+SEARCH_LIMIT = 500
+
+
+def estimated_count(model, using):
+    """The database's own estimate of ``model``'s row count, or None if it has none."""
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        elif connection.vendor == 'sqlite':
+            # An upper bound (deleted ids leave gaps), read off the end of the rowid b-tree.
+            cursor.execute(f"SELECT MAX(rowid) FROM {table}")
+        else:
+            return None
+        row = cursor.fetchone()
+    # reltuples is -1 until the table has been vacuumed or analyzed.
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > EXACT_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+
+class ExactSearchAdmin(ScalableAdmin):
+    """
+    Matches the search term exactly against each of ``search_fields``, one
+    indexed lookup per field, instead of the admin's default icontains.
+    """
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        ids = set()
+        for field in self.search_fields:
+            ids.update(self.model.objects.filter(**{field: term}).values_list('pk', flat=True)[:SEARCH_LIMIT])
+        return queryset.filter(pk__in=ids), False
 
-from django.contrib import admin
-from .models import PublicQuestion, LawyerProfile, CustomerProfile, VerificationToken
 
 @admin.register(PublicQuestion)
-class PublicQuestionAdmin(admin.ModelAdmin):
+class PublicQuestionAdmin(ScalableAdmin):
     list_display = ("title", "is_answered", "created_at", "answered_by")
+    list_filter = ("is_answered",)
+    list_select_related = ("answered_by__user",)
+    ordering = ("-created_at", "-id")
+    sortable_by = ("created_at",)
     search_fields = ("title", "body")
+    search_help_text = "Full-text search over title, body and answer."
+    raw_id_fields = ("answered_by", "claimed_by")
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        ids = [q.pk for q in search_questions(search_term, answered_only=False, limit=SEARCH_LIMIT)]
+        return queryset.filter(pk__in=ids), False
+
 
 @admin.register(LawyerProfile)
-class LawyerProfileAdmin(admin.ModelAdmin):
+class LawyerProfileAdmin(ExactSearchAdmin):
     list_display = ("user", "specialty", "years_experience", "bar_number", "approved")
-    list_filter = ("approved", "specialty")
-    search_fields = ("user__username", "bar_number", "specialty")
+    list_filter = ("approved",)
+    list_select_related = ("user",)
+    ordering = ("-id",)
+    sortable_by = ()
+    search_fields = ("user__username", "bar_number")
+    search_help_text = "Exact username or bar number."
+    raw_id_fields = ("user",)
+    actions = ["approve_lawyers", "unapprove_lawyers"]
+
+    def _set_approved(self, request, queryset, approved):
+        changed = directory.set_approved(queryset, approved)
+        # The UPDATE skips post_save, which would otherwise refresh these.
+        transaction.on_commit(partial(summary.refresh_lawyers, changed if approved else -changed))
+        self.message_user(request, f"{changed} lawyer(s) {'approved' if approved else 'unapproved'}.", messages.SUCCESS)
+
+    @admin.action(description="Approve selected lawyers", permissions=["change"])
+    def approve_lawyers(self, request, queryset):
+        self._set_approved(request, queryset, True)
+
+    @admin.action(description="Unapprove selected lawyers", permissions=["change"])
+    def unapprove_lawyers(self, request, queryset):
+        self._set_approved(request, queryset, False)
+
 
 @admin.register(CustomerProfile)
-class CustomerProfileAdmin(admin.ModelAdmin):
+class CustomerProfileAdmin(ExactSearchAdmin):
     list_display = ("user",)
-    search_fields = ("user__username", "user__email")
+    list_select_related = ("user",)
+    ordering = ("-id",)
+    sortable_by = ()
+    search_fields = ("user__username",)
+    search_help_text = "Exact username."
+    raw_id_fields = ("user",)
+
 
 @admin.register(VerificationToken)
-class VerificationTokenAdmin(admin.ModelAdmin):
+class VerificationTokenAdmin(ExactSearchAdmin):
     list_display = ("user", "token", "created_at")
+    list_select_related = ("user",)
+    ordering = ("-created_at", "-id")
+    sortable_by = ("created_at",)
     search_fields = ("user__username", "token")
+    search_help_text = "Exact username or token."
+    raw_id_fields = ("user",)
+    actions = ["purge_tokens", "purge_expired_tokens"]
+
+    def get_actions(self, request):
+        # The stock action loads every selected row for its confirmation page.
+        actions = super().get_actions(request)
+        actions.pop("delete_selected", None)
+        return actions
+
+    @admin.action(description="Delete selected tokens", permissions=["delete"])
+    def purge_tokens(self, request, queryset):
+        # No signals or dependent rows, so this is a single DELETE.
+        deleted, _ = queryset.delete()
+        self.message_user(request, f"{deleted} token(s) deleted.", messages.SUCCESS)
+
+    @admin.action(description="Delete selected tokens that have expired", permissions=["delete"])
+    def purge_expired_tokens(self, request, queryset):
+        deleted, _ = queryset.filter(created_at__lt=VerificationToken.expiry_cutoff()).delete()
+        self.message_user(request, f"{deleted} expired token(s) deleted.", messages.SUCCESS)
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(ScalableAdmin):
+    list_display = ("subject", "status", "attempts", "next_attempt_at", "created_at", "sent_at")
+    list_filter = ("status",)
+    ordering = ("-id",)
+    sortable_by = ()
+    readonly_fields = ("created_at", "sent_at")
+
+
+@admin.register(Specialty)
+class SpecialtyAdmin(admin.ModelAdmin):
+    list_display = ("name", "slug", "lawyer_count")
+    search_fields = ("name",)
+    readonly_fields = ("lawyer_count", "band_counts")
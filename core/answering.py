@@ -0,0 +1,136 @@
+"""
+Claiming and answering public questions without lost updates.
+
+Every state change is a single conditional UPDATE on one PublicQuestion
+row, so two lawyers racing for the same question never overwrite each
+other and no lock is held between the GET of the answer form and its POST:
+
+* claim() reserves an unanswered question for settings.ANSWER_CLAIM_MINUTES
+  unless another lawyer holds a live claim.
+* submit_answer() only succeeds while the question is unanswered and not
+  claimed by someone else. Exactly one concurrent submitter wins.
+* release() gives a claim back early.
+
+The work queue (pending(), claim_next()) serves each lawyer the oldest
+unanswered questions routed to their specialty straight off the partial
+core_pq_queue_idx index, so a page costs the same whatever the archive size.
+
+claim(), submit_answer() and release() have ``a``-prefixed twins for
+core.async_views.
+"""
+from datetime import timedelta
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import duplicates, summary
+from .models import PublicQuestion, Specialty
+
+CLAIMED = 'claimed'
+ANSWERED = 'answered'
+TAKEN = 'taken'
+MISSING = 'missing'
+
+QUEUE_PAGE_SIZE = 20
+# Candidates claim_next() tries before giving up where rows cannot be locked.
+CLAIM_ATTEMPTS = 50
+
+
+def _open_for(lawyer, now):
+    """Unanswered, and either unclaimed, claimed by ``lawyer`` or with a lapsed claim."""
+    return Q(is_answered=False) & (
+        Q(claimed_by__isnull=True) | Q(claimed_by=lawyer) | Q(claim_expires_at__lte=now)
+    )
+
+
+def claim(pk, lawyer):
+    """Reserves question ``pk`` for ``lawyer``. Returns CLAIMED, ANSWERED, TAKEN or MISSING."""
+    now = timezone.now()
+    claimed = PublicQuestion.objects.filter(_open_for(lawyer, now), pk=pk).update(
+        claimed_by=lawyer, claim_expires_at=now + timedelta(minutes=settings.ANSWER_CLAIM_MINUTES),
+    )
+    if claimed:
+        return CLAIMED
+    question = PublicQuestion.objects.filter(pk=pk).values('is_answered').first()
+    if question is None:
+        return MISSING
+    return ANSWERED if question['is_answered'] else TAKEN
+
+
+def submit_answer(pk, lawyer, answer_text):
+    """Records the answer if nobody beat ``lawyer`` to it. Returns True on success."""
+    answered = PublicQuestion.objects.filter(_open_for(lawyer, timezone.now()), pk=pk).update(
+        answer_text=answer_text, is_answered=True, answered_by=lawyer, claimed_by=None, claim_expires_at=None,
+    )
+    if answered:
+        # update() bypasses post_save, so core.signals never sees this change.
+        transaction.on_commit(partial(summary.refresh_questions, 1))
+        transaction.on_commit(partial(duplicates.index, pk))
+    return bool(answered)
+
+
+def release(pk, lawyer):
+    PublicQuestion.objects.filter(pk=pk, claimed_by=lawyer, is_answered=False).update(
+        claimed_by=None, claim_expires_at=None,
+    )
+
+
+def routed_specialty(lawyer):
+    """The taxonomy entry for ``lawyer``'s free-text specialty, or None (general queue)."""
+    return Specialty.lookup(lawyer.specialty)
+
+
+def pending(specialty, after=None):
+    """
+    One page (plus one look-ahead row) of unanswered questions routed to
+    ``specialty``, oldest first. ``specialty=None`` is the general queue.
+    ``after`` is a (created_at, id) keyset cursor.
+    """
+    questions = PublicQuestion.objects.filter(is_answered=False, specialty=specialty).order_by('created_at', 'id')
+    if after:
+        created_at, pk = after
+        # The redundant bound lets the index seek to the cursor; the OR alone
+        # would scan the queue from its head.
+        questions = questions.filter(created_at__gte=created_at).filter(
+            Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+        )
+    return questions[:QUEUE_PAGE_SIZE + 1]
+
+
+def claim_next(lawyer, specialty):
+    """
+    Claims the oldest question in ``specialty``'s queue that nobody else is
+    working on and returns it, or None when the queue is drained.
+    """
+    now = timezone.now()
+    candidates = (
+        PublicQuestion.objects.filter(_open_for(lawyer, now), specialty=specialty)
+        .order_by('created_at', 'id')
+    )
+    if connection.features.has_select_for_update_skip_locked:
+        # Concurrent callers each lock a different row instead of queueing
+        # behind the same one.
+        with transaction.atomic():
+            question = candidates.select_for_update(skip_locked=True).first()
+            if question is not None:
+                question.claimed_by = lawyer
+                question.claim_expires_at = now + timedelta(minutes=settings.ANSWER_CLAIM_MINUTES)
+                PublicQuestion.objects.filter(pk=question.pk).update(
+                    claimed_by=lawyer, claim_expires_at=question.claim_expires_at,
+                )
+            return question
+
+    # No row locks (SQLite): compare-and-swap down the queue until one sticks.
+    for pk in candidates.values_list('pk', flat=True)[:CLAIM_ATTEMPTS]:
+        if claim(pk, lawyer) == CLAIMED:
+            return PublicQuestion.objects.get(pk=pk)
+    return None
+
+
+aclaim = sync_to_async(claim)
+asubmit_answer = sync_to_async(submit_answer)
+arelease = sync_to_async(release)
@@ -0,0 +1,73 @@
+"""
+Read-only JSON API over answered questions and the lawyer directory, for
+the mobile client.
+
+Both endpoints page with the same keyset cursors as the HTML pages
+(``before`` for questions, ``after`` plus the directory filters for lawyers)
+and carry the same ETag/Last-Modified validators (core.conditional), so a
+client polling with If-None-Match gets an empty 304 until something it can
+see has changed.
+"""
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from .conditional import LAWYERS, QUESTIONS, conditional
+from .directory import DirectoryQuery
+from .pagecache import cache_anonymous_page
+from .replicas import replica_reads
+from .views import PUBLIC_QUESTIONS_PAGE_SIZE, _decode_cursor, _encode_cursor, _public_questions_queryset
+
+
+def _next_url(request, **params):
+    query = request.GET.copy()
+    for key, value in params.items():
+        query[key] = value
+    return request.build_absolute_uri(f"{request.path}?{query.urlencode()}")
+
+
+@require_GET
+@replica_reads
+@conditional(QUESTIONS)
+@cache_anonymous_page
+def questions(request):
+    cursor = _decode_cursor(request.GET.get('before'))
+    page = list(_public_questions_queryset(False, cursor))
+    next_url = None
+    if len(page) > PUBLIC_QUESTIONS_PAGE_SIZE:
+        page = page[:PUBLIC_QUESTIONS_PAGE_SIZE]
+        next_url = _next_url(request, before=_encode_cursor(page[-1]))
+    return JsonResponse({
+        'results': [
+            {
+                'id': q.pk,
+                'title': q.title,
+                'body': q.body,
+                'answer': q.answer_text,
+                'answered_by': q.answered_by.user.username if q.answered_by else None,
+                'created_at': q.created_at,
+            }
+            for q in page
+        ],
+        'next': next_url,
+    })
+
+
+@require_GET
+@replica_reads
+@conditional(LAWYERS)
+@cache_anonymous_page
+def lawyers(request):
+    directory = DirectoryQuery(request.GET)
+    page, next_cursor = directory.page(list(directory.entries()))
+    return JsonResponse({
+        'results': [
+            {
+                'id': entry.lawyer_id,
+                'name': entry.display_name,
+                'specialty': {'name': entry.specialty.name, 'slug': entry.specialty.slug},
+                'years_experience': entry.years_experience,
+            }
+            for entry in page
+        ],
+        'next': _next_url(request, after=next_cursor) if next_cursor else None,
+    })
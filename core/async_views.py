@@ -0,0 +1,117 @@
+"""
+Async variants of the read-heavy views and the answer submission, used when
+settings.ASYNC_VIEWS is on (see guardian_angel/asgi.py for the run mode).
+
+They share their query building with core.views and use the async ORM for
+the queries themselves. Template rendering runs in one sync_to_async call,
+because context processors and the template's ``user`` lookups go through
+the synchronous session/auth layer.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.shortcuts import aget_object_or_404, redirect, render
+
+from . import answering, summary
+from .conditional import LAWYERS, QUESTIONS, conditional
+from .directory import DirectoryQuery
+from .models import LawyerProfile, PublicQuestion, VerificationToken
+from .pagecache import cache_anonymous_page
+from .replicas import replica_reads
+from .views import (
+    CLAIM_ERRORS,
+    _decode_cursor,
+    _public_questions_context,
+    _public_questions_queryset,
+)
+
+arender = sync_to_async(render)
+
+
+async def _lawyer_profile(user):
+    if not user.is_authenticated:
+        return None
+    return await LawyerProfile.objects.filter(user_id=user.pk).afirst()
+
+
+@replica_reads
+@conditional(QUESTIONS, LAWYERS)
+@cache_anonymous_page
+async def home(request):
+    return await arender(request, 'core/home.html', {'summary': await summary.aload()})
+
+
+@replica_reads
+@conditional(QUESTIONS)
+@cache_anonymous_page
+async def public_questions(request):
+    lawyer = await _lawyer_profile(await request.auser())
+    cursor = _decode_cursor(request.GET.get('before'))
+    questions = [q async for q in _public_questions_queryset(lawyer is not None, cursor)]
+    return await arender(request, 'core/public_questions.html', _public_questions_context(questions, lawyer, cursor))
+
+
+@replica_reads
+@conditional(LAWYERS)
+@cache_anonymous_page
+async def lawyers_list(request):
+    directory = DirectoryQuery(request.GET)
+    context = directory.context(
+        [entry async for entry in directory.entries()],
+        [specialty async for specialty in directory.specialties()],
+    )
+    return await arender(request, 'core/lawyers_list.html', context)
+
+
+async def verify_email(request, token):
+    try:
+        vt = await VerificationToken.objects.select_related('user').aget(token=token)
+    except VerificationToken.DoesNotExist:
+        messages.error(request, "Invalid or expired verification link.")
+        return redirect('login')
+
+    if vt.is_expired:
+        # Left in place so purge_verification_tokens also removes the unverified account.
+        messages.error(request, "Invalid or expired verification link.")
+        return redirect('login')
+
+    user = vt.user
+    user.is_active = True
+    await user.asave()
+    await vt.adelete()
+
+    messages.success(request, "Email verified. You can now log in.")
+    return redirect('login')
+
+
+async def answer_question(request, pk):
+    # login_required only learns to wrap async views in Django 5.1.
+    user = await request.auser()
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+
+    lawyer = await _lawyer_profile(user)
+    if lawyer is None:
+        messages.error(request, "Only lawyers can answer questions.")
+        return redirect('public_questions')
+
+    if request.method == "POST":
+        if 'release' in request.POST:
+            await answering.arelease(pk, lawyer)
+            return redirect('public_questions')
+        answer_text = request.POST.get("answer_text", "").strip()
+        if answer_text:
+            if await answering.asubmit_answer(pk, lawyer, answer_text):
+                messages.success(request, "Answer posted.")
+            else:
+                messages.error(request, "Another lawyer answered or took over this question first.")
+            return redirect('public_questions')
+        messages.error(request, "Answer cannot be empty.")
+
+    q = await aget_object_or_404(PublicQuestion, pk=pk)
+    outcome = await answering.aclaim(pk, lawyer)
+    if outcome != answering.CLAIMED:
+        messages.error(request, CLAIM_ERRORS[outcome])
+        return redirect('public_questions')
+    return await arender(request, 'core/answer_question.html', {'q': q, 'claim_minutes': settings.ANSWER_CLAIM_MINUTES})
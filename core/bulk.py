@@ -0,0 +1,198 @@
+"""
+Streaming bulk import and export for the ``import_data`` and ``export_data``
+management commands.
+
+Everything is a generator pipeline so memory stays flat however large the
+file: rows are read lazily from CSV or JSONL, grouped into batches, and each
+batch is written with bulk_create inside its own transaction. Exports walk
+the table with ``.iterator(chunk_size=...)``.
+
+Rows refer to other records by natural key (usernames, specialty names)
+rather than primary key, so archives can be loaded into a database that
+already has data. bulk_create skips model signals, so the commands bring
+the lawyer directory, the duplicate index and the home summary up to date
+when they are done.
+"""
+import csv
+import json
+from abc import ABC, abstractmethod
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.utils.dateparse import parse_datetime
+
+from .models import CustomerProfile, LawyerProfile, PublicQuestion, Specialty
+
+FORMATS = ('csv', 'jsonl')
+
+
+# ------------
+# File formats
+# ------------
+def format_for(path):
+    """The format implied by ``path``'s extension (jsonl for - ), or None."""
+    if path == '-':
+        return 'jsonl'
+    extension = path.rsplit('.', 1)[-1].lower()
+    return extension if extension in FORMATS else None
+
+
+def read_rows(fh, fmt):
+    if fmt == 'csv':
+        yield from csv.DictReader(fh)
+    else:
+        for line in fh:
+            if line.strip():
+                yield json.loads(line)
+
+
+def write_rows(fh, fmt, fields, rows):
+    """Writes ``rows`` (dicts) and returns how many were written."""
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(fh, fieldnames=fields)
+        writer.writeheader()
+        for count, row in enumerate(rows, 1):
+            writer.writerow(row)
+    else:
+        for count, row in enumerate(rows, 1):
+            fh.write(json.dumps(row, default=str))
+            fh.write('\n')
+    return count
+
+
+def batched(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def _bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes')
+
+
+def _datetime(value):
+    if not value:
+        return None
+    return parse_datetime(value) if isinstance(value, str) else value
+
+
+def _password(value):
+    # Only hashes travel in archives; rows without one get an unusable password.
+    return value or make_password(None)
+
+
+# --------
+# Datasets
+# --------
+class Dataset(ABC):
+    model = None
+    fields = ()
+    # export column -> ORM lookup for .values()
+    lookups = {}
+
+    def export_rows(self, chunk_size):
+        lookups = [self.lookups.get(f, f) for f in self.fields]
+        queryset = self.model.objects.order_by('pk').values_list(*lookups)
+        for values in queryset.iterator(chunk_size=chunk_size):
+            yield dict(zip(self.fields, values))
+
+    @abstractmethod
+    def import_batch(self, rows):
+        """Inserts one batch of parsed rows; returns the number created."""
+
+
+class _AccountDataset(Dataset):
+    """Datasets whose rows each create a User plus a profile."""
+    user_fields = ('username', 'email', 'password', 'is_active', 'date_joined')
+    lookups = {f: f'user__{f}' for f in user_fields}
+
+    def _create_users(self, rows):
+        User.objects.bulk_create(
+            User(
+                username=row['username'], email=row.get('email') or '', password=_password(row.get('password')),
+                is_active=_bool(row.get('is_active', True)),
+                **({'date_joined': _datetime(row['date_joined'])} if row.get('date_joined') else {}),
+            )
+            for row in rows
+        )
+        # Not every backend returns primary keys from a bulk insert.
+        return dict(User.objects.filter(username__in=[row['username'] for row in rows]).values_list('username', 'id'))
+
+
+class QuestionDataset(Dataset):
+    model = PublicQuestion
+    fields = ('title', 'body', 'name', 'email', 'created_at', 'is_answered', 'answer_text',
+              'answered_by', 'specialty')
+    lookups = {'answered_by': 'answered_by__user__username', 'specialty': 'specialty__name'}
+
+    def __init__(self):
+        self._specialties = {}
+
+    def _specialty_id(self, name):
+        if not name:
+            return None
+        if name not in self._specialties:
+            self._specialties[name] = Specialty.for_name(name).pk
+        return self._specialties[name]
+
+    def import_batch(self, rows):
+        usernames = {row['answered_by'] for row in rows if row.get('answered_by')}
+        lawyers = dict(
+            LawyerProfile.objects.filter(user__username__in=usernames).values_list('user__username', 'id')
+        ) if usernames else {}
+        created = PublicQuestion.objects.bulk_create(
+            PublicQuestion(
+                title=row['title'], body=row['body'], name=row.get('name') or '', email=row.get('email') or '',
+                is_answered=_bool(row.get('is_answered', False)), answer_text=row.get('answer_text') or '',
+                answered_by_id=lawyers.get(row.get('answered_by')), specialty_id=self._specialty_id(row.get('specialty')),
+            )
+            for row in rows
+        )
+        # created_at is auto_now_add, so bulk_create stamped every row with
+        # now; put the archived times back with one batched UPDATE.
+        dated = []
+        for question, row in zip(created, rows):
+            if created_at := _datetime(row.get('created_at')):
+                question.created_at = created_at
+                dated.append(question)
+        PublicQuestion.objects.bulk_update(dated, ['created_at'], batch_size=1000)
+        return len(created)
+
+
+class LawyerDataset(_AccountDataset):
+    model = LawyerProfile
+    fields = _AccountDataset.user_fields + ('specialty', 'years_experience', 'bar_number', 'bar_certificate',
+                                            'approved')
+
+    def import_batch(self, rows):
+        user_ids = self._create_users(rows)
+        created = LawyerProfile.objects.bulk_create(
+            LawyerProfile(
+                user_id=user_ids[row['username']], specialty=row.get('specialty') or '',
+                years_experience=int(row.get('years_experience') or 0), bar_number=row.get('bar_number') or '',
+                bar_certificate=row.get('bar_certificate') or '', approved=_bool(row.get('approved', False)),
+            )
+            for row in rows
+        )
+        return len(created)
+
+
+class CustomerDataset(_AccountDataset):
+    model = CustomerProfile
+    fields = _AccountDataset.user_fields
+
+    def import_batch(self, rows):
+        user_ids = self._create_users(rows)
+        created = CustomerProfile.objects.bulk_create(CustomerProfile(user_id=user_ids[row['username']]) for row in rows)
+        return len(created)
+
+
+DATASETS = {
+    'questions': QuestionDataset,
+    'lawyers': LawyerDataset,
+    'customers': CustomerDataset,
+}
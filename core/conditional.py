@@ -0,0 +1,88 @@
+"""
+Conditional GET (ETag / Last-Modified) for the public pages and the JSON API.
+
+The validators come from the HomeSummary row, whose questions_changed_at
+and lawyers_changed_at stamps core.summary moves whenever an answered
+question or the lawyer directory changes. Deciding whether a client's copy
+is current is therefore one primary-key read, and a match is answered with
+304 before the page cache, the view or the template run.
+
+Like the page cache, this only applies to anonymous GET/HEAD requests:
+signed-in pages carry per-user content. The ETag is also part of the page
+cache key (see request.content_etag below). A worker that missed an
+invalidation therefore renders the page afresh instead of serving its old
+copy under the new validators, which clients would then keep revalidating
+as current.
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from . import summary
+from .language import get_language
+from .pagecache import _is_cacheable_request
+
+QUESTIONS = 'questions'
+LAWYERS = 'lawyers'
+
+
+def validators(request, parts):
+    """(ETag, Last-Modified timestamp) for content built from ``parts``, or (None, None)."""
+    if not _is_cacheable_request(request):
+        return None, None
+    home = summary.load()
+    stamps = [getattr(home, f'{part}_changed_at') for part in parts]
+    key = ':'.join([get_language(request), *(stamp.isoformat() for stamp in stamps)])
+    return f'"{hashlib.md5(key.encode()).hexdigest()}"', int(max(stamps).timestamp())
+
+
+def _not_modified(request, etag, last_modified):
+    if etag is None:
+        return None
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def _begin(request, etag, last_modified):
+    """Returns the 304 response, or None after noting ``etag`` for core.pagecache."""
+    response = _not_modified(request, etag, last_modified)
+    if response is None and etag is not None:
+        request.content_etag = etag
+    return response
+
+
+def _add_validators(response, etag, last_modified):
+    if etag is not None and response.status_code == 200:
+        response.headers.setdefault('ETag', etag)
+        response.headers.setdefault('Last-Modified', http_date(last_modified))
+    return response
+
+
+def conditional(*parts):
+    """
+    Answers anonymous GET/HEAD requests with 304 Not Modified while the
+    ``parts`` (QUESTIONS, LAWYERS) the view shows are unchanged, and adds
+    ETag and Last-Modified to full responses. Works on sync and async views.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapped(request, *args, **kwargs):
+                etag, last_modified = await sync_to_async(validators)(request, parts)
+                response = _begin(request, etag, last_modified)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return _add_validators(response, etag, last_modified)
+            return async_wrapped
+
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            etag, last_modified = validators(request, parts)
+            response = _begin(request, etag, last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            return _add_validators(response, etag, last_modified)
+        return wrapped
+    return decorator
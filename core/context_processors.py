@@ -1,3 +1,5 @@
+from .language import get_language
+
 
 def site_lang(request):
-    return {'lang': request.session.get('lang','en')}
+    return {'lang': get_language(request)}
@@ -0,0 +1,263 @@
+"""
+Public lawyer directory.
+
+LawyerDirectoryEntry holds one denormalized card per approved lawyer, and
+Specialty.lawyer_count and Specialty.band_counts hold the precomputed
+specialty and experience facets. All are kept current by core.signals
+whenever a LawyerProfile (or its user) is saved, and by set_approved() for
+the admin's bulk approval, which bypasses signals. The directory page reads
+only these tables, and the facets come from the specialty list it already
+loads.
+"""
+from django.db import transaction
+from django.db.models import BigIntegerField, Count, Q
+
+from .models import LawyerDirectoryEntry, LawyerProfile, Specialty
+
+DIRECTORY_PAGE_SIZE = 24
+
+# (key, label, min years, max years exclusive)
+EXPERIENCE_BANDS = [
+    ('0-4', '0–4', 0, 5),
+    ('5-9', '5–9', 5, 10),
+    ('10-19', '10–19', 10, 20),
+    ('20+', '20+', 20, None),
+]
+
+# Largest PositiveIntegerField value every backend accepts.
+MAX_YEARS = 2 ** 31 - 1
+
+# ?sort= value -> (field, descending)
+SORTS = {
+    'name': ('display_name', False),
+    'experience': ('years_experience', False),
+    '-experience': ('years_experience', True),
+}
+
+
+# -----------
+# Maintenance
+# -----------
+def _band_aggregates():
+    aggregates = {}
+    for key, _, low, high in EXPERIENCE_BANDS:
+        condition = Q(years_experience__gte=low)
+        if high is not None:
+            condition &= Q(years_experience__lt=high)
+        aggregates[key] = Count('pk', filter=condition)
+    return aggregates
+
+
+def recount_specialties(specialty_ids=None):
+    """
+    Recomputes Specialty.lawyer_count and band_counts, for the given ids or
+    for all specialties. Call inside a transaction: the specialty rows are
+    locked first, so concurrent recounts of one specialty run one after the
+    other and the later one counts the earlier one's entries.
+    """
+    specialties = Specialty.objects.order_by('pk').select_for_update().only('pk')
+    if specialty_ids is not None:
+        specialties = specialties.filter(pk__in=specialty_ids)
+    specialties = list(specialties)
+    counts = {
+        row.pop('specialty'): row
+        for row in LawyerDirectoryEntry.objects.filter(specialty__in=specialties)
+        .order_by().values('specialty').annotate(**_band_aggregates())
+    }
+    for specialty in specialties:
+        bands = counts.get(specialty.pk, {})
+        specialty.band_counts = {key: bands.get(key, 0) for key, _, _, _ in EXPERIENCE_BANDS}
+        # The bands cover every number of years, so they add up to the total.
+        specialty.lawyer_count = sum(specialty.band_counts.values())
+    Specialty.objects.bulk_update(specialties, ['lawyer_count', 'band_counts'], batch_size=500)
+
+
+def refresh_lawyers(lawyer_ids):
+    """
+    Brings the directory entries of the given LawyerProfile ids up to date.
+    Returns the change in the number of listed lawyers.
+    """
+    lawyer_ids = list(lawyer_ids)
+    with transaction.atomic():
+        before = dict(
+            LawyerDirectoryEntry.objects.filter(lawyer_id__in=lawyer_ids).values_list('lawyer_id', 'specialty_id')
+        )
+        touched = set(before.values())
+        profiles = LawyerProfile.objects.filter(pk__in=lawyer_ids).select_related('user')
+        listed = []
+        for lp in profiles:
+            if not lp.approved:
+                continue
+            specialty = Specialty.for_name(lp.specialty)
+            touched.add(specialty.pk)
+            LawyerDirectoryEntry.objects.update_or_create(
+                lawyer=lp,
+                defaults={
+                    'display_name': lp.user.username,
+                    'specialty': specialty,
+                    'years_experience': lp.years_experience,
+                },
+            )
+            listed.append(lp.pk)
+        LawyerDirectoryEntry.objects.filter(lawyer_id__in=lawyer_ids).exclude(lawyer_id__in=listed).delete()
+        recount_specialties(touched)
+    return len(listed) - len(before)
+
+
+def set_approved(lawyers, approved):
+    """
+    Approves (or un-approves) every LawyerProfile in the ``lawyers`` queryset
+    with one UPDATE and applies the change to the directory in bulk rather
+    than lawyer by lawyer. Returns how many profiles changed.
+    """
+    changed = LawyerProfile.objects.filter(pk__in=lawyers.filter(approved=not approved).values('pk'))
+    with transaction.atomic():
+        touched = set(
+            LawyerDirectoryEntry.objects.filter(lawyer__in=changed.values('pk')).values_list('specialty', flat=True)
+        )
+        if approved:
+            specialties = {}
+            rows = changed.values_list('pk', 'user__username', 'specialty', 'years_experience')
+            batch = []
+            for pk, username, name, years in rows.iterator(chunk_size=2000):
+                if name not in specialties:
+                    specialties[name] = Specialty.for_name(name)
+                    touched.add(specialties[name].pk)
+                batch.append(LawyerDirectoryEntry(
+                    lawyer_id=pk, display_name=username, specialty=specialties[name], years_experience=years,
+                ))
+                if len(batch) >= 2000:
+                    LawyerDirectoryEntry.objects.bulk_create(batch, ignore_conflicts=True)
+                    batch = []
+            LawyerDirectoryEntry.objects.bulk_create(batch, ignore_conflicts=True)
+        else:
+            LawyerDirectoryEntry.objects.filter(lawyer__in=changed.values('pk')).delete()
+        # After the directory, since the UPDATE empties ``changed``.
+        count = changed.update(approved=approved)
+        recount_specialties(touched)
+    return count
+
+
+def rebuild():
+    """Recreates the whole directory from LawyerProfile. Returns the number of entries."""
+    with transaction.atomic():
+        LawyerDirectoryEntry.objects.all().delete()
+        specialties = {}
+        batch = []
+        created = 0
+        for lp in LawyerProfile.objects.filter(approved=True).select_related('user').iterator(chunk_size=2000):
+            key = lp.specialty
+            if key not in specialties:
+                specialties[key] = Specialty.for_name(key)
+            batch.append(LawyerDirectoryEntry(
+                lawyer=lp, display_name=lp.user.username,
+                specialty=specialties[key], years_experience=lp.years_experience,
+            ))
+            if len(batch) >= 2000:
+                created += len(LawyerDirectoryEntry.objects.bulk_create(batch))
+                batch = []
+        created += len(LawyerDirectoryEntry.objects.bulk_create(batch))
+        recount_specialties()
+    return created
+
+
+# -------
+# Queries
+# -------
+def _decode_cursor(value, field):
+    """
+    Parses a "<sort value>_<lawyer id>" cursor for a sort on ``field``; None
+    when missing or malformed.
+    """
+    sort_value, sep, pk = (value or "").rpartition("_")
+    if not sep:
+        return None
+    try:
+        pk = int(pk)
+        if field == 'years_experience':
+            sort_value = int(sort_value)
+    except ValueError:
+        return None
+    # Numbers no column can hold would fail in the database (DataError on PostgreSQL).
+    if not 0 < pk <= BigIntegerField.MAX_BIGINT:
+        return None
+    if field == 'years_experience' and not 0 <= sort_value <= MAX_YEARS:
+        return None
+    return sort_value, pk
+
+
+class DirectoryQuery:
+    """
+    Parses directory filters from a QueryDict and builds the querysets for
+    one page. The querysets are lazy so sync and async views can each
+    evaluate them their own way.
+    """
+    def __init__(self, params):
+        self.specialty_slug = params.get('specialty', '')
+        self.band = next((b for b in EXPERIENCE_BANDS if b[0] == params.get('experience')), None)
+        self.sort = params.get('sort') if params.get('sort') in SORTS else 'name'
+        self.cursor = _decode_cursor(params.get('after'), SORTS[self.sort][0])
+
+    def _filtered(self):
+        entries = LawyerDirectoryEntry.objects.all()
+        if self.specialty_slug:
+            entries = entries.filter(specialty__slug=self.specialty_slug)
+        return entries
+
+    def entries(self):
+        entries = self._filtered().select_related('specialty')
+        if self.band:
+            _, _, low, high = self.band
+            entries = entries.filter(years_experience__gte=low)
+            if high is not None:
+                entries = entries.filter(years_experience__lt=high)
+
+        field, descending = SORTS[self.sort]
+        if self.cursor:
+            value, pk = self.cursor
+            op = 'lt' if descending else 'gt'
+            # The inclusive bound is redundant but lets the index seek to the
+            # cursor; the OR alone would scan every earlier entry.
+            entries = entries.filter(**{f'{field}__{op}e': value}).filter(
+                Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'lawyer_id__{op}': pk})
+            )
+        prefix = '-' if descending else ''
+        return entries.order_by(f'{prefix}{field}', f'{prefix}lawyer_id')[:DIRECTORY_PAGE_SIZE + 1]
+
+    @staticmethod
+    def specialties():
+        return Specialty.objects.filter(lawyer_count__gt=0)
+
+    def band_counts(self, specialties):
+        """
+        Lawyers per experience band within the selected specialty (or all of
+        them), added up from the evaluated specialties() rather than counted.
+        """
+        counts = dict.fromkeys((key for key, _, _, _ in EXPERIENCE_BANDS), 0)
+        for specialty in specialties:
+            if not self.specialty_slug or specialty.slug == self.specialty_slug:
+                for key in counts:
+                    counts[key] += specialty.band_counts.get(key, 0)
+        return counts
+
+    def page(self, entries):
+        """Splits evaluated entries() into (this page, cursor for the next page or None)."""
+        if len(entries) <= DIRECTORY_PAGE_SIZE:
+            return entries, None
+        entries = entries[:DIRECTORY_PAGE_SIZE]
+        field, _ = SORTS[self.sort]
+        return entries, f"{getattr(entries[-1], field)}_{entries[-1].lawyer_id}"
+
+    def context(self, entries, specialties):
+        entries, next_cursor = self.page(entries)
+        band_counts = self.band_counts(specialties)
+        return {
+            'lawyers': entries,
+            'specialties': specialties,
+            'experience_bands': [(key, label, band_counts[key]) for key, label, _, _ in EXPERIENCE_BANDS],
+            'selected_specialty': self.specialty_slug,
+            'selected_experience': self.band[0] if self.band else '',
+            'sort': self.sort,
+            'next_cursor': next_cursor,
+            'is_first_page': self.cursor is None,
+        }
@@ -0,0 +1,193 @@
+"""
+Near-duplicate detection for public questions (MinHash + LSH).
+
+Each answered question's title and body are reduced to their set of
+words and then to a MinHash signature of NUM_PERM 32-bit minima, whose
+agreement rate estimates the Jaccard similarity of two word sets. The
+signature is cut into BANDS bands of ROWS values; every band is hashed to
+one QuestionBucket key. Two questions that share any bucket key are
+candidates, which makes a lookup BANDS index probes on core_dup_bucket_idx
+however many questions there are, instead of a comparison against each.
+Candidates are then ranked by their estimated similarity.
+
+With 16 bands of 4 rows, questions at 0.5 similarity are found about two
+times in three and those at 0.7 or more almost always.
+
+The index only holds answered questions. core.signals and core.answering
+keep it current (index()/unindex()), import_data fills in what bulk_create
+skipped, and rebuild_duplicate_index recreates it.
+"""
+import array
+import hashlib
+import random
+import re
+import zlib
+
+from django.db import transaction
+from django.db.models import Count
+
+from .models import PublicQuestion, QuestionBucket, QuestionSignature
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+# Estimated Jaccard similarity from which a question is shown as a likely duplicate.
+SIMILARITY_THRESHOLD = 0.5
+MAX_CANDIDATES = 50
+MAX_RESULTS = 5
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# Fixed seed: signatures must be comparable across processes and restarts.
+_rng = random.Random(0x5eed)
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERM)]
+_WORD_RE = re.compile(r"\w{3,}", re.UNICODE)
+
+
+# Frequent English and French words that say nothing about the question.
+STOP_WORDS = frozenset("""
+    and are but can could did does for from had has have how may might must not our should that the their them
+    then there they this was what when where which who why will with would you your
+    aux avec ces comment dans des elle est été faire les leur mais mes mon nous par pas peut plus pour quand que
+    quel quelle qui sans ses son sont sur une vos votre vous
+""".split())
+
+
+def shingles(title, body):
+    """The distinct words of three or more letters, lowercased, less STOP_WORDS."""
+    return set(_WORD_RE.findall(f"{title} {body}".lower())) - STOP_WORDS
+
+
+def signature(title, body):
+    """The MinHash signature as an array of NUM_PERM ints, or None for text without words."""
+    hashes = [zlib.crc32(s.encode()) for s in shingles(title, body)]
+    if not hashes:
+        return None
+    return array.array('I', (
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes) & _MAX_HASH
+        for a, b in _PERMUTATIONS
+    ))
+
+
+def bucket_keys(sig):
+    """One signed 63-bit key per band."""
+    keys = []
+    for band in range(BANDS):
+        digest = hashlib.blake2b(sig[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8,
+                                 person=band.to_bytes(2, 'little')).digest()
+        keys.append(int.from_bytes(digest, 'little') >> 1)
+    return keys
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def _load(minhash):
+    sig = array.array('I')
+    sig.frombytes(bytes(minhash))
+    return sig
+
+
+# -----------
+# Maintenance
+# -----------
+def _rows(pk, sig):
+    return QuestionSignature(question_id=pk, minhash=sig.tobytes()), [
+        QuestionBucket(key=key, question_id=pk) for key in bucket_keys(sig)
+    ]
+
+
+def unindex(pks):
+    with transaction.atomic():
+        QuestionBucket.objects.filter(question_id__in=pks).delete()
+        QuestionSignature.objects.filter(question_id__in=pks).delete()
+
+
+def index(pk):
+    """(Re)indexes question ``pk`` if it is answered, and removes it otherwise."""
+    question = PublicQuestion.objects.filter(pk=pk, is_answered=True).values('title', 'body').first()
+    sig = signature(question['title'], question['body']) if question else None
+    with transaction.atomic():
+        unindex([pk])
+        if sig is not None:
+            row, buckets = _rows(pk, sig)
+            row.save(force_insert=True)
+            QuestionBucket.objects.bulk_create(buckets)
+
+
+def index_questions(questions, batch_size=1000):
+    """Indexes the (pk, title, body) rows of ``questions``; returns how many were indexed."""
+    indexed = 0
+    signatures, buckets = [], []
+
+    def flush():
+        with transaction.atomic():
+            unindex([row.question_id for row in signatures])
+            QuestionSignature.objects.bulk_create(signatures)
+            QuestionBucket.objects.bulk_create(buckets)
+
+    for pk, title, body in questions.values_list('pk', 'title', 'body').iterator(chunk_size=batch_size):
+        sig = signature(title, body)
+        if sig is None:
+            continue
+        row, rows = _rows(pk, sig)
+        signatures.append(row)
+        buckets.extend(rows)
+        indexed += 1
+        if len(signatures) >= batch_size:
+            flush()
+            signatures, buckets = [], []
+    if signatures:
+        flush()
+    return indexed
+
+
+def index_missing(batch_size=1000):
+    """Indexes answered questions that have no signature yet (e.g. after a bulk import)."""
+    return index_questions(
+        PublicQuestion.objects.filter(is_answered=True, signature__isnull=True).order_by('pk'), batch_size,
+    )
+
+
+def rebuild(batch_size=1000):
+    """Recreates the whole index. Returns the number of questions indexed."""
+    QuestionBucket.objects.all().delete()
+    QuestionSignature.objects.all().delete()
+    return index_missing(batch_size)
+
+
+# ------
+# Lookup
+# ------
+def candidate_ids(keys):
+    """Ids of questions in any of the buckets ``keys``, those sharing the most bands first."""
+    return (
+        QuestionBucket.objects.filter(key__in=keys)
+        .values('question_id').annotate(bands=Count('*')).order_by('-bands')
+        .values_list('question_id', flat=True)[:MAX_CANDIDATES]
+    )
+
+
+def similar_questions(title, body, limit=MAX_RESULTS):
+    """
+    Answered questions that are likely duplicates of ``title``/``body``, most
+    similar first, as a list of (similarity, PublicQuestion).
+    """
+    sig = signature(title, body)
+    if sig is None:
+        return []
+    candidates = list(candidate_ids(bucket_keys(sig)))
+    if not candidates:
+        return []
+    scored = sorted(
+        (
+            (score, pk)
+            for pk, minhash in QuestionSignature.objects.filter(pk__in=candidates).values_list('pk', 'minhash')
+            if (score := similarity(sig, _load(minhash))) >= SIMILARITY_THRESHOLD
+        ),
+        reverse=True,
+    )[:limit]
+    questions = PublicQuestion.objects.select_related('answered_by__user').in_bulk([pk for _, pk in scored])
+    return [(score, questions[pk]) for score, pk in scored if pk in questions]
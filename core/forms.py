@@ -1,13 +1,28 @@
 
 from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.template.defaultfilters import filesizeformat
+from django.contrib.auth.forms import PasswordResetForm
 from django.contrib.auth.models import User
+from django.template import loader
+from .mail import queue_email
 from .models import PublicQuestion
 
+def validate_bar_certificate(f):
+    # core.uploads.HashingUploadHandler marks oversized uploads instead of buffering them.
+    if getattr(f, 'too_large', False) or f.size > settings.MAX_UPLOAD_BYTES:
+        raise ValidationError(f"File too large (max {filesizeformat(settings.MAX_UPLOAD_BYTES)}).")
+
 class PublicQuestionForm(forms.ModelForm):
     class Meta:
         model = PublicQuestion
-        fields = ["title", "body"]
+        fields = ["title", "body", "specialty"]
         widgets = {"body": forms.Textarea(attrs={"rows": 4})}
+        labels = {"specialty": "Area of law"}
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["specialty"].empty_label = "Not sure"
 
 class CustomerRegistrationForm(forms.ModelForm):
     password = forms.CharField(widget=forms.PasswordInput)
@@ -34,7 +49,7 @@ class LawyerRegistrationForm(forms.ModelForm):
     specialty = forms.CharField()
     years_experience = forms.IntegerField(min_value=0)
     bar_number = forms.CharField()
-    bar_certificate = forms.FileField()
+    bar_certificate = forms.FileField(validators=[validate_bar_certificate])
     class Meta:
         model = User
         fields = ["username", "email"]
@@ -62,3 +77,14 @@ class LawyerSettingsForm(forms.ModelForm):
     class Meta:
         model = User
         fields = ["username", "email"]
+
+class QueuedPasswordResetForm(PasswordResetForm):
+    """Puts the reset email on the outbox instead of sending it inline."""
+    def send_mail(self, subject_template_name, email_template_name, context,
+                  from_email, to_email, html_email_template_name=None):
+        subject = "".join(loader.render_to_string(subject_template_name, context).splitlines())
+        body = loader.render_to_string(email_template_name, context)
+        html_body = ""
+        if html_email_template_name is not None:
+            html_body = loader.render_to_string(html_email_template_name, context)
+        queue_email(subject, body, [to_email], html_body=html_body, from_email=from_email)
@@ -0,0 +1,46 @@
+"""
+Site language without sessions.
+
+The chosen language lives in a signed cookie (settings.LANGUAGE_COOKIE_*),
+so anonymous visitors never get a session row just to remember it.
+core.middleware.LanguageSwitcherMiddleware resolves it once per request,
+activates the matching gettext catalog (core/locale), sets the cookie when
+``?lang=`` changes it and marks responses with ``Content-Language``,
+``Vary: Cookie`` and ``Cache-Control: private``.
+
+The language is not in the URL, so a shared cache could only tell the
+copies apart by keying on the whole Cookie header (session, CSRF and any
+analytics cookies), and would almost never hit. Responses are therefore
+private to the browser, which still revalidates them cheaply with their
+ETag (core.conditional). The per-language shared copy is core.pagecache.
+"""
+from django.conf import settings
+
+LANGUAGES = tuple(code for code, _ in settings.LANGUAGES)
+DEFAULT_LANGUAGE = settings.LANGUAGE_CODE
+COOKIE_SALT = 'core.language'
+
+
+def from_cookie(request):
+    lang = request.get_signed_cookie(settings.LANGUAGE_COOKIE_NAME, default=None, salt=COOKIE_SALT)
+    return lang if lang in LANGUAGES else None
+
+
+def get_language(request):
+    """The request's site language; set by the middleware, else read from the cookie."""
+    lang = getattr(request, 'site_lang', None)
+    if lang is None:
+        lang = from_cookie(request) or DEFAULT_LANGUAGE
+    return lang
+
+
+def set_language_cookie(response, lang):
+    response.set_signed_cookie(
+        settings.LANGUAGE_COOKIE_NAME, lang, salt=COOKIE_SALT,
+        max_age=settings.LANGUAGE_COOKIE_AGE,
+        path=settings.LANGUAGE_COOKIE_PATH,
+        domain=settings.LANGUAGE_COOKIE_DOMAIN,
+        secure=settings.LANGUAGE_COOKIE_SECURE,
+        httponly=settings.LANGUAGE_COOKIE_HTTPONLY,
+        samesite=settings.LANGUAGE_COOKIE_SAMESITE,
+    )
@@ -0,0 +1,110 @@
+"""
+Database-backed outbound email queue.
+
+Views call queue_email(), which only inserts an OutboundEmail row. The
+``send_queued_email`` management command drains the outbox over a single
+reused connection to settings.EMAIL_BACKEND, outside any database
+transaction, retrying failures with exponential backoff.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import metrics
+from .models import OutboundEmail
+
+
+def queue_email(subject, body, to, html_body='', from_email=None):
+    with metrics.timed('email'):
+        return OutboundEmail.objects.create(
+            subject=subject,
+            body=body,
+            html_body=html_body,
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+            to=list(to),
+        )
+
+
+def _retry_delay(attempts):
+    base = settings.EMAIL_QUEUE_RETRY_BASE_SECONDS
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), settings.EMAIL_QUEUE_RETRY_MAX_SECONDS))
+
+
+def _build_message(email, connection):
+    msg = EmailMultiAlternatives(email.subject, email.body, email.from_email, email.to, connection=connection)
+    if email.html_body:
+        msg.attach_alternative(email.html_body, "text/html")
+    return msg
+
+
+def _claim(batch_size):
+    """
+    Leases up to ``batch_size`` due emails to this worker and returns them.
+
+    Each row's attempt is counted and its next_attempt_at pushed
+    settings.EMAIL_QUEUE_LEASE_SECONDS out, then the claim commits, so no
+    lock is held while talking to the mail server. Rows of a worker that dies
+    mid-batch come due again when the lease runs out.
+    """
+    now = timezone.now()
+    leased = {'next_attempt_at': now + timedelta(seconds=settings.EMAIL_QUEUE_LEASE_SECONDS),
+              'attempts': F('attempts') + 1}
+    due = (
+        OutboundEmail.objects.filter(status=OutboundEmail.PENDING, next_attempt_at__lte=now)
+        .order_by('next_attempt_at', 'id')
+    )
+    if connection.features.has_select_for_update_skip_locked:
+        # Concurrent workers lock and lease disjoint rows.
+        with transaction.atomic():
+            pks = list(due.select_for_update(skip_locked=True).values_list('pk', flat=True)[:batch_size])
+            OutboundEmail.objects.filter(pk__in=pks).update(**leased)
+    else:
+        # No row locks (SQLite): compare-and-swap each row's due time, so a
+        # row another worker leased in between is skipped.
+        pks = [
+            pk for pk, due_at in due.values_list('pk', 'next_attempt_at')[:batch_size]
+            if OutboundEmail.objects.filter(pk=pk, status=OutboundEmail.PENDING, next_attempt_at=due_at).update(**leased)
+        ]
+    return list(OutboundEmail.objects.filter(pk__in=pks).order_by('id')) if pks else []
+
+
+def send_queued_email(batch_size=50, max_attempts=None):
+    """
+    Sends one batch of due emails and returns (sent, failed) counts.
+
+    Several workers can drain the same outbox: each leases its own rows (see
+    _claim()) and records every outcome with its own short UPDATE.
+    """
+    max_attempts = max_attempts or settings.EMAIL_QUEUE_MAX_ATTEMPTS
+    sent = failed = 0
+    batch = _claim(batch_size)
+    if not batch:
+        return sent, failed
+
+    mail_connection = get_connection(fail_silently=False)
+    try:
+        for email in batch:
+            try:
+                mail_connection.open()  # no-op while the connection is alive
+                mail_connection.send_messages([_build_message(email, mail_connection)])
+            except Exception as exc:
+                failed += 1
+                if email.attempts >= max_attempts:
+                    outcome = {'status': OutboundEmail.FAILED}
+                else:
+                    outcome = {'next_attempt_at': timezone.now() + _retry_delay(email.attempts)}
+                OutboundEmail.objects.filter(pk=email.pk).update(last_error=str(exc)[:1000], **outcome)
+                # The server may have dropped us; the next message reconnects.
+                mail_connection.close()
+            else:
+                sent += 1
+                OutboundEmail.objects.filter(pk=email.pk).update(
+                    status=OutboundEmail.SENT, sent_at=timezone.now(), last_error='',
+                )
+    finally:
+        mail_connection.close()
+    return sent, failed
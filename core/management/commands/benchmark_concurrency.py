@@ -0,0 +1,106 @@
+import asyncio
+import json
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.metrics import percentile
+
+
+async def _slow_request(host, port, path, host_header, delay):
+    """
+    One HTTP/1.1 request from a slow client: headers are sent a line at a
+    time and the response is read in small chunks, pausing ``delay`` seconds
+    between each, so the server has to keep the connection around.
+    Returns (status code, seconds).
+    """
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        lines = [f"GET {path} HTTP/1.1", f"Host: {host_header}", "User-Agent: benchmark_concurrency",
+                 "Connection: close", ""]
+        for line in lines:
+            writer.write(f"{line}\r\n".encode())
+            await writer.drain()
+            if delay:
+                await asyncio.sleep(delay)
+        status_line = await reader.readline()
+        while await reader.read(4096):
+            if delay:
+                await asyncio.sleep(delay)
+    finally:
+        writer.close()
+    status = int(status_line.split()[1]) if status_line else 0
+    return status, time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-tests a running server with many concurrent (optionally slow) clients and reports "
+        "throughput and latency percentiles. Run it once against the WSGI deployment and once "
+        "against the ASGI one to compare."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help="e.g. http://127.0.0.1:8000/public-questions/")
+        parser.add_argument('--concurrency', type=int, default=100)
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--slow-client-delay', type=float, default=0.0,
+                            help="Seconds a client waits between header lines and response chunks.")
+        parser.add_argument('--label', default='', help="Name for this run in the JSON output (e.g. wsgi, asgi).")
+        parser.add_argument('--output', help="Write results to this JSON file.")
+
+    def handle(self, *args, url, concurrency, requests, slow_client_delay, label, output, **options):
+        parts = urlsplit(url)
+        if parts.scheme != 'http' or not parts.hostname:
+            raise CommandError("Only plain http:// URLs are supported.")
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        port = parts.port or 80
+
+        results = asyncio.run(self._run(parts.hostname, port, path, parts.netloc, concurrency, requests, slow_client_delay))
+        self.stdout.write(
+            f"{label or url}: {results['requests']} requests, concurrency {concurrency}, "
+            f"{results['throughput_rps']} req/s, p50={results['p50_ms']}ms p95={results['p95_ms']}ms "
+            f"p99={results['p99_ms']}ms, errors={results['errors']}, statuses={results['statuses']}"
+        )
+        if output:
+            with open(output, 'w') as fh:
+                json.dump({'label': label, 'url': url, 'concurrency': concurrency,
+                           'slow_client_delay': slow_client_delay, **results}, fh, indent=2)
+
+    async def _run(self, host, port, path, host_header, concurrency, total, delay):
+        queue = asyncio.Queue()
+        for _ in range(total):
+            queue.put_nowait(None)
+        latencies, statuses = [], Counter()
+        errors = 0
+
+        async def client():
+            nonlocal errors
+            while not queue.empty():
+                queue.get_nowait()
+                try:
+                    status, seconds = await _slow_request(host, port, path, host_header, delay)
+                except OSError:
+                    errors += 1
+                    continue
+                statuses[status] += 1
+                latencies.append(seconds * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        return {
+            'requests': total,
+            'seconds': round(elapsed, 3),
+            'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+            'p50_ms': round(percentile(latencies, 50) or 0, 2),
+            'p95_ms': round(percentile(latencies, 95) or 0, 2),
+            'p99_ms': round(percentile(latencies, 99) or 0, 2),
+            'errors': errors,
+            'statuses': dict(statuses),
+        }
@@ -0,0 +1,97 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+# name -> environment overrides for the gunicorn workers (see DATABASES in settings).
+CONFIGS = {
+    'fresh': {'DB_CONN_MAX_AGE': '0', 'DB_CONN_HEALTH_CHECKS': 'False'},
+    'persistent': {'DB_CONN_MAX_AGE': '600', 'DB_CONN_HEALTH_CHECKS': 'False'},
+    'checked': {'DB_CONN_MAX_AGE': '600', 'DB_CONN_HEALTH_CHECKS': 'True'},
+}
+
+
+def _wait_for_port(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f"gunicorn exited with status {process.returncode}.")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f"gunicorn did not start listening on port {port} within {timeout}s.")
+
+
+class Command(BaseCommand):
+    help = (
+        "Starts gunicorn once per database connection setting (fresh connections, persistent "
+        "connections, health checks), load-tests it with benchmark_concurrency and "
+        "compares p95 latency. Uses the configured DATABASE_URL, which must already be migrated "
+        "and seeded; point it at a local PostgreSQL (e.g. the postgres Docker image) to see the "
+        "connection cost production pays."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--configs', default='fresh,persistent,checked',
+                            help=f"Comma-separated, from: {', '.join(CONFIGS)}.")
+        parser.add_argument('--path', default='/public-questions/')
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--warmup', type=int, default=50, help="Requests sent before measuring.")
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--output', help="Write results to this JSON file.")
+
+    def handle(self, *args, configs, path, workers, concurrency, requests, warmup, port, output, **options):
+        names = [c.strip() for c in configs.split(',') if c.strip()]
+        unknown = [name for name in names if name not in CONFIGS]
+        if unknown:
+            raise CommandError(f"Unknown config(s): {', '.join(unknown)}.")
+
+        url = f"http://127.0.0.1:{port}{path}"
+        results = {}
+        for name in names:
+            env = {
+                **os.environ, **CONFIGS[name],
+                'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'guardian_angel.settings'),
+                # Every request should reach the database, not the page cache.
+                'PAGE_CACHE_TIMEOUT': '0',
+            }
+            process = subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn', 'guardian_angel.wsgi', '-w', str(workers),
+                 '-b', f'127.0.0.1:{port}', '--log-level', 'warning'],
+                cwd=settings.BASE_DIR, env=env,
+            )
+            try:
+                _wait_for_port(port, process)
+                for _ in range(warmup):
+                    urllib.request.urlopen(url).read()
+                with tempfile.NamedTemporaryFile(suffix='.json') as fh:
+                    call_command('benchmark_concurrency', url, concurrency=concurrency, requests=requests,
+                                 label=name, output=fh.name, stdout=self.stdout)
+                    results[name] = json.load(open(fh.name))
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+
+        baseline = results[names[0]]['p95_ms']
+        for name in names:
+            p95 = results[name]['p95_ms']
+            change = f"{(p95 - baseline) / baseline * 100:+.1f}%" if baseline else 'n/a'
+            self.stdout.write(f"  {name:<12} p95={p95:>8}ms ({change} vs {names[0]})")
+
+        if output:
+            with open(output, 'w') as fh:
+                json.dump({'database': settings.DATABASES['default']['ENGINE'], 'path': path, 'workers': workers,
+                           'configs': {name: CONFIGS[name] for name in names}, 'results': results}, fh, indent=2)
+            self.stdout.write(f"Wrote {output}")
@@ -0,0 +1,280 @@
+import json
+import logging
+import random
+import secrets
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.template.backends.django import Template
+from django.test import Client
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from core import directory, pagecache, summary
+from core.metrics import percentile
+from core.models import CustomerProfile, LawyerProfile, PublicQuestion, Specialty, VerificationToken
+from core.urls import urlpatterns
+
+# scale name -> (questions, lawyers)
+SCALES = {
+    '1k': (1_000, 100),
+    '10k': (10_000, 1_000),
+    '100k': (100_000, 10_000),
+    '1m': (1_000_000, 100_000),
+}
+
+# Upper bound on SQL queries per request, by benchmark label.
+QUERY_BUDGETS = {
+    'home': 3,
+    'public_questions': 4,
+    'public_questions[lawyer]': 6,
+    'search': 4,
+    'ask_public_question': 5,
+    'lawyers_list': 4,
+    'register': 2,
+    'register_lawyer': 2,
+    'verify_email': 5,
+    'login': 2,
+    'logout': 5,
+    'settings_customer': 5,
+    'settings_lawyer': 5,
+    'about': 2,
+    'switch_language': 2,
+    'answer_question': 6,
+    'question_queue': 6,
+    'api_questions': 3,
+    'api_lawyers': 3,
+}
+
+BATCH_SIZE = 5000
+
+
+def _needs_args(name):
+    return any(p.name == name and p.pattern.converters for p in urlpatterns)
+
+
+@contextmanager
+def _sql_timer():
+    """Counts and times every SQL statement on the default connection."""
+    state = {'count': 0, 'seconds': 0.0}
+
+    def wrapper(execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            state['count'] += 1
+            state['seconds'] += time.perf_counter() - start
+
+    with connection.execute_wrapper(wrapper):
+        yield state
+
+
+@contextmanager
+def _render_timer():
+    """Accumulates time spent in top-level Django template renders."""
+    original = Template.render
+    state = {'depth': 0, 'seconds': 0.0}
+
+    def timed_render(self, *args, **kwargs):
+        state['depth'] += 1
+        start = time.perf_counter()
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            state['depth'] -= 1
+            if not state['depth']:
+                state['seconds'] += time.perf_counter() - start
+
+    Template.render = timed_render
+    try:
+        yield state
+    finally:
+        Template.render = original
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a throwaway test database at one or more scales and measures SQL query count, "
+        "SQL time, render time and latency percentiles for every route in core.urls."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='1k', help=f"Comma-separated, from: {', '.join(SCALES)}.")
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--output', help="Write results to this JSON file.")
+        parser.add_argument('--cold', action='store_true', help="Invalidate the page cache before every request.")
+        parser.add_argument('--enforce-budgets', action='store_true',
+                            help="Exit non-zero if a route exceeds its query budget.")
+
+    def handle(self, *args, scales, iterations, output, cold, enforce_budgets, **options):
+        scale_names = [s.strip().lower() for s in scales.split(',') if s.strip()]
+        unknown = [s for s in scale_names if s not in SCALES]
+        if unknown:
+            raise CommandError(f"Unknown scale(s): {', '.join(unknown)}")
+
+        # One JSON log line per request would drown the report.
+        logging.getLogger('core.requests').setLevel(logging.WARNING)
+        setup_test_environment()
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        try:
+            results = {}
+            for name in scale_names:
+                call_command('flush', interactive=False, verbosity=0)
+                questions, lawyers = SCALES[name]
+                self.stdout.write(f"Seeding {name}: {questions} questions, {lawyers} lawyers")
+                self._seed(questions, lawyers)
+                results[name] = self._run_routes(iterations, cold)
+        finally:
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+
+        report = {
+            'database': connection.vendor,
+            'iterations': iterations,
+            'cold': cold,
+            'scales': results,
+        }
+        if output:
+            with open(output, 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(f"Wrote {output}")
+
+        over_budget = [
+            f"{scale}/{label} ({row['queries']} > {QUERY_BUDGETS[label]})"
+            for scale, rows in results.items()
+            for label, row in rows.items()
+            if label in QUERY_BUDGETS and row.get('queries', 0) > QUERY_BUDGETS[label]
+        ]
+        if over_budget:
+            message = f"Over query budget: {', '.join(over_budget)}"
+            if enforce_budgets:
+                raise CommandError(message)
+            self.stderr.write(message)
+
+    # -------
+    # Seeding
+    # -------
+    def _seed(self, n_questions, n_lawyers):
+        password = make_password('benchmark-password')
+        User.objects.bulk_create(
+            (User(username=f'lawyer{i}', email=f'lawyer{i}@example.com', password=password) for i in range(n_lawyers)),
+            batch_size=BATCH_SIZE,
+        )
+        User.objects.create(username='customer', email='customer@example.com', password=password)
+        LawyerProfile.objects.bulk_create(
+            (
+                LawyerProfile(user_id=user_id, specialty=random.choice(['Family', 'Immigration', 'Criminal', 'Tax']),
+                              years_experience=random.randint(0, 40), bar_number=str(user_id),
+                              bar_certificate='bar_certificates/benchmark.pdf', approved=bool(user_id % 4))
+                for user_id in User.objects.filter(username__startswith='lawyer').values_list('id', flat=True).iterator()
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        CustomerProfile.objects.create(user=User.objects.get(username='customer'))
+        # bulk_create skips the signals that keep the directory current.
+        directory.rebuild()
+
+        lawyer_ids = list(LawyerProfile.objects.values_list('id', flat=True))
+        specialty_ids = list(Specialty.objects.values_list('id', flat=True)) + [None]
+        PublicQuestion.objects.bulk_create(
+            (
+                PublicQuestion(
+                    name='customer', email='customer@example.com',
+                    title=f'Benchmark question {i}', body='How does this work? ' * 10,
+                    is_answered=bool(i % 2), answer_text='It depends. ' * 10 if i % 2 else '',
+                    answered_by_id=random.choice(lawyer_ids) if i % 2 else None,
+                    specialty_id=random.choice(specialty_ids),
+                )
+                for i in range(n_questions)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        summary.rebuild()
+
+    # -----------
+    # Measurement
+    # -----------
+    def _routes(self):
+        """
+        (label, url name, role, kwargs factory, query string) for every route in
+        core.urls. Routes without an entry are requested anonymously with no args.
+        """
+        def unanswered():
+            return {'pk': PublicQuestion.objects.filter(is_answered=False).values_list('pk', flat=True).first()}
+
+        def token():
+            user = User.objects.get(username='customer')
+            return {'token': VerificationToken.objects.create(user=user, token=secrets.token_hex(32)).token}
+
+        known = {
+            'public_questions': [('public_questions', None, None, ''),
+                                 ('public_questions[lawyer]', 'lawyer', None, '')],
+            'search': [('search', None, None, '?q=question')],
+            'ask_public_question': [('ask_public_question', 'customer', None, '')],
+            'verify_email': [('verify_email', None, token, '')],
+            'logout': [('logout', 'customer', None, '')],
+            'settings_customer': [('settings_customer', 'customer', None, '')],
+            'settings_lawyer': [('settings_lawyer', 'lawyer', None, '')],
+            'switch_language': [('switch_language', None, None, '?lang=fr&next=/')],
+            'answer_question': [('answer_question', 'lawyer', unanswered, '')],
+            'question_queue': [('question_queue', 'lawyer', None, '')],
+        }
+        routes = []
+        for pattern in urlpatterns:
+            name = pattern.name
+            for label, role, kwargs_fn, query in known.get(name, [(name, None, None, '')]):
+                routes.append((label, name, role, kwargs_fn, query))
+        return routes
+
+    def _run_routes(self, iterations, cold):
+        users = {
+            'customer': User.objects.get(username='customer'),
+            'lawyer': User.objects.filter(lawyerprofile__approved=True).first(),
+        }
+        rows = {}
+        for label, name, role, kwargs_fn, query in self._routes():
+            if kwargs_fn is None and _needs_args(name):
+                rows[label] = {'skipped': 'route needs arguments'}
+                continue
+            latencies, sql_times, render_times, query_counts, statuses = [], [], [], [], set()
+            for _ in range(iterations):
+                client = Client()
+                if role:
+                    client.force_login(users[role])
+                url = reverse(name, kwargs=kwargs_fn() if kwargs_fn else None) + query
+                if cold:
+                    pagecache.invalidate()
+                with _render_timer() as render, _sql_timer() as sql:
+                    start = time.perf_counter()
+                    response = client.get(url)
+                    elapsed = time.perf_counter() - start
+                statuses.add(response.status_code)
+                latencies.append(elapsed * 1000)
+                render_times.append(render['seconds'] * 1000)
+                sql_times.append(sql['seconds'] * 1000)
+                query_counts.append(sql['count'])
+
+            latencies.sort()
+            rows[label] = {
+                'statuses': sorted(statuses),
+                'queries': max(query_counts),
+                'sql_ms': round(sum(sql_times) / iterations, 3),
+                'render_ms': round(sum(render_times) / iterations, 3),
+                'p50_ms': round(percentile(latencies, 50), 3),
+                'p95_ms': round(percentile(latencies, 95), 3),
+                'p99_ms': round(percentile(latencies, 99), 3),
+            }
+            row = rows[label]
+            self.stdout.write(
+                f"  {label:<28} q={row['queries']:<3} sql={row['sql_ms']:>8}ms render={row['render_ms']:>8}ms "
+                f"p50={row['p50_ms']:>8}ms p95={row['p95_ms']:>8}ms p99={row['p99_ms']:>8}ms {row['statuses']}"
+            )
+        return rows
@@ -0,0 +1,118 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from core.metrics import percentile
+from core.models import CustomerProfile
+
+ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'core': 'core.sessions',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+
+# (label, url name, method, POST data) — a logged-in customer's typical requests,
+# including ones that flash a message.
+REQUESTS = [
+    ('public_questions', 'public_questions', 'get', None),
+    ('settings_customer', 'settings_customer', 'get', None),
+    ('ask_public_question', 'ask_public_question', 'get', None),
+    ('ask_public_question[post]', 'ask_public_question', 'post', {'title': 'Benchmark', 'body': 'How?'}),
+    ('about', 'about', 'get', None),
+]
+
+
+@contextmanager
+def _query_counter():
+    """Counts SQL statements on the default connection, and those on django_session."""
+    state = {'queries': 0, 'session': 0}
+
+    def wrapper(execute, sql, params, many, context):
+        state['queries'] += 1
+        if 'django_session' in sql:
+            state['session'] += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield state
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares session engines by replaying a logged-in customer's requests against a "
+        "throwaway test database and reporting DB round trips and latency per request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--engines', default='db,core',
+                            help=f"Comma-separated, from: {', '.join(ENGINES)}, or dotted engine paths.")
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--output', help="Write results to this JSON file.")
+
+    def handle(self, *args, engines, iterations, output, **options):
+        logging.getLogger('core.requests').setLevel(logging.WARNING)
+        setup_test_environment()
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        try:
+            user = User.objects.create(username='customer', email='customer@example.com',
+                                       password=make_password('benchmark-password'))
+            CustomerProfile.objects.create(user=user)
+            results = {}
+            for name in [e.strip() for e in engines.split(',') if e.strip()]:
+                engine = ENGINES.get(name, name)
+                with override_settings(SESSION_ENGINE=engine):
+                    caches['sessions'].clear()
+                    results[name] = self._run(user, iterations)
+                self._report(name, results[name])
+        finally:
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+
+        if output:
+            with open(output, 'w') as fh:
+                json.dump({'database': connection.vendor, 'iterations': iterations, 'engines': results}, fh, indent=2)
+            self.stdout.write(f"Wrote {output}")
+
+    def _run(self, user, iterations):
+        # One client for the whole run, as a browser would keep its session cookie.
+        client = Client()
+        client.force_login(user)
+        rows = {}
+        for label, name, method, data in REQUESTS:
+            latencies, queries, session_queries = [], [], []
+            for _ in range(iterations):
+                with _query_counter() as counted:
+                    start = time.perf_counter()
+                    getattr(client, method)(reverse(name), data)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                queries.append(counted['queries'])
+                session_queries.append(counted['session'])
+            latencies.sort()
+            rows[label] = {
+                'queries': round(sum(queries) / iterations, 2),
+                'session_queries': round(sum(session_queries) / iterations, 2),
+                'p50_ms': round(percentile(latencies, 50), 3),
+                'p95_ms': round(percentile(latencies, 95), 3),
+            }
+        return rows
+
+    def _report(self, name, rows):
+        self.stdout.write(name)
+        for label, row in rows.items():
+            self.stdout.write(
+                f"  {label:<28} queries={row['queries']:<6} session={row['session_queries']:<6} "
+                f"p50={row['p50_ms']:>8}ms p95={row['p95_ms']:>8}ms"
+            )
@@ -0,0 +1,91 @@
+import json
+import time
+from copy import deepcopy
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory
+from django.utils import timezone, translation
+
+from core.metrics import percentile
+from core.models import PublicQuestion
+
+LOADERS = {
+    'cached': settings.TEMPLATES[0]['OPTIONS']['loaders'],
+    'uncached': ['django.template.loaders.filesystem.Loader', 'django.template.loaders.app_directories.Loader'],
+}
+
+
+def _engine(loaders):
+    config = deepcopy(settings.TEMPLATES[0])
+    config['OPTIONS']['loaders'] = loaders
+    return DjangoTemplates({'NAME': 'benchmark', 'APP_DIRS': False, **{k: v for k, v in config.items() if k != 'BACKEND'}})
+
+
+def _questions(n):
+    # Unsaved rows: the benchmark measures rendering, not queries.
+    now = timezone.now()
+    return [
+        PublicQuestion(pk=i + 1, title=f'Question {i}', body='How does this work? ' * 10, created_at=now,
+                       is_answered=True, answer_text='It depends. ' * 10)
+        for i in range(n)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures render time of base.html and public_questions.html with many items, per "
+        "language, with the configured cached loader and without it. Needs no database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', default='20,200,1000', help="Comma-separated list sizes for public_questions.")
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--output', help="Write results to this JSON file.")
+
+    def handle(self, *args, items, iterations, output, **options):
+        sizes = [int(n) for n in items.split(',') if n.strip()]
+        factory = RequestFactory()
+        results = {}
+        for loader_name, loaders in LOADERS.items():
+            engine = _engine(loaders)
+            for lang in ('en', 'fr'):
+                cases = [('base.html', 'base.html', {})] + [
+                    (f'public_questions[{n}]', 'core/public_questions.html',
+                     {'questions': _questions(n), 'is_lawyer': False, 'next_cursor': 'x', 'is_first_page': True})
+                    for n in sizes
+                ]
+                for label, template_name, context in cases:
+                    request = factory.get('/public-questions/')
+                    request.user = AnonymousUser()
+                    request.site_lang = lang
+                    with translation.override(lang):
+                        timings = self._time(engine, template_name, context, request, iterations)
+                    n = len(context.get('questions', ())) or None
+                    row = {
+                        'p50_ms': round(percentile(timings, 50), 3),
+                        'p95_ms': round(percentile(timings, 95), 3),
+                        'per_item_us': round(percentile(timings, 50) * 1000 / n, 2) if n else None,
+                    }
+                    results[f'{loader_name}/{lang}/{label}'] = row
+                    self.stdout.write(
+                        f"  {loader_name:<9}{lang:<4}{label:<26} p50={row['p50_ms']:>9}ms p95={row['p95_ms']:>9}ms"
+                        + (f" per item={row['per_item_us']}µs" if n else "")
+                    )
+
+        if output:
+            with open(output, 'w') as fh:
+                json.dump({'iterations': iterations, 'results': results}, fh, indent=2)
+            self.stdout.write(f"Wrote {output}")
+
+    @staticmethod
+    def _time(engine, template_name, context, request, iterations):
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            engine.get_template(template_name).render(context, request)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        return timings
@@ -0,0 +1,86 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from django.http import QueryDict
+
+from core.answering import pending
+from core.directory import DirectoryQuery
+from core.duplicates import BANDS, candidate_ids
+from core.models import LawyerDirectoryEntry, LawyerProfile, PublicQuestion, Specialty, VerificationToken
+from core.search import SEARCH_CONFIGS, index_name, search_sql
+
+
+class SearchPlan:
+    """Stands in for a queryset in hot_queries(), since core.search runs raw SQL."""
+
+    def __init__(self, lang):
+        self.lang = lang
+
+    def explain(self):
+        sql, params = search_sql(connection.vendor, ['contract'], self.lang)
+        explain = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+        with connection.cursor() as cursor:
+            cursor.execute(explain + sql, params)
+            return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+
+def hot_queries():
+    """
+    (label, queryset, expected index) for the filters the public views run.
+    Keep these in step with core.views, core.summary, core.duplicates, core.admin
+    and core.search.
+    """
+    queries = [
+        ('home summary: latest answered', PublicQuestion.objects.filter(is_answered=True)[:5],
+         'core_pq_answered_created_idx'),
+        ('home summary: lawyers', LawyerDirectoryEntry.objects.order_by('-years_experience', '-lawyer_id')[:6],
+         'core_dir_years_idx'),
+        ('public_questions: answered page', PublicQuestion.objects.filter(is_answered=True).order_by('-created_at', '-id')[:21],
+         'core_pq_answered_created_idx'),
+        ('public_questions: lawyer page', PublicQuestion.objects.order_by('-created_at', '-id')[:21],
+         'core_pq_created_idx'),
+        ('question_queue: specialty', pending(Specialty(pk=1)),
+         'core_pq_queue_idx'),
+        ('question_queue: general', pending(None),
+         'core_pq_queue_idx'),
+        ('lawyers_list: by name', DirectoryQuery(QueryDict()).entries(),
+         'core_dir_name_idx'),
+        ('lawyers_list: by experience', DirectoryQuery(QueryDict('sort=-experience')).entries(),
+         'core_dir_years_idx'),
+        ('verification token expiry', VerificationToken.expired().values_list('pk', 'user_id')[:1000],
+         'core_token_created_idx'),
+        ('ask_public_question: duplicate candidates', candidate_ids(range(BANDS)),
+         'core_dup_bucket_idx'),
+        ('admin: lawyer bar number search', LawyerProfile.objects.filter(bar_number='B-1').values_list('pk'),
+         'core_lawyer_bar_idx'),
+        ('admin: tokens changelist', VerificationToken.objects.order_by('-created_at', '-id')[:50],
+         'core_token_created_idx'),
+    ]
+    if connection.vendor in ('sqlite', 'postgresql'):
+        # The trailing space stops core_publicquestion_fts matching core_publicquestion_fts_fr.
+        queries += [
+            (f'search: {lang}', SearchPlan(lang), f'{index_name(connection.vendor, lang)} ')
+            for lang in SEARCH_CONFIGS
+        ]
+    return queries
+
+
+class Command(BaseCommand):
+    help = "Runs EXPLAIN on the hot public queries and fails if any of them does not use its index."
+
+    def handle(self, *args, **options):
+        failures = []
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # Small or freshly created tables make sequential scans look
+                # cheapest; we want to know whether the index is usable at all.
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+            for label, queryset, index in hot_queries():
+                plan = queryset.explain()
+                ok = index in plan
+                self.stdout.write(f"{'ok  ' if ok else 'FAIL'} {label}: {' | '.join(plan.splitlines())}")
+                if not ok:
+                    failures.append(label)
+        if failures:
+            raise CommandError(f"Queries not using their index: {', '.join(failures)}")
@@ -0,0 +1,32 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import bulk
+
+
+class Command(BaseCommand):
+    help = "Streams questions, lawyers or customers to a CSV or JSONL file with flat memory use."
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(bulk.DATASETS))
+        parser.add_argument('path', help="File to write, or - for stdout.")
+        parser.add_argument('--format', choices=bulk.FORMATS,
+                            help="Defaults to the file extension, or jsonl for stdout.")
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help="Rows fetched from the database per round trip.")
+
+    def handle(self, *args, dataset, path, format, chunk_size, **options):
+        fmt = format or bulk.format_for(path)
+        if fmt is None:
+            raise CommandError("Cannot tell the format from the file name; pass --format.")
+        exporter = bulk.DATASETS[dataset]()
+        start = time.perf_counter()
+        if path == '-':
+            bulk.write_rows(sys.stdout, fmt, exporter.fields, exporter.export_rows(chunk_size))
+            return
+        with open(path, 'w', newline='', encoding='utf-8') as fh:
+            count = bulk.write_rows(fh, fmt, exporter.fields, exporter.export_rows(chunk_size))
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"Exported {count} {dataset} to {path} in {elapsed:.2f}s ({count / elapsed:.0f} rows/sec).")
@@ -0,0 +1,54 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from core import bulk, directory, duplicates, summary
+
+
+class Command(BaseCommand):
+    help = (
+        "Streams questions, lawyers or customers from a CSV or JSONL file into the database "
+        "with batched bulk inserts, and reports throughput."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(bulk.DATASETS))
+        parser.add_argument('path', help="File to read, or - for stdin.")
+        parser.add_argument('--format', choices=bulk.FORMATS,
+                            help="Defaults to the file extension, or jsonl for stdin.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, dataset, path, format, batch_size, **options):
+        fmt = format or bulk.format_for(path)
+        if fmt is None:
+            raise CommandError("Cannot tell the format from the file name; pass --format.")
+        importer = bulk.DATASETS[dataset]()
+        fh = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        created = 0
+        start = time.perf_counter()
+        try:
+            for batch in bulk.batched(bulk.read_rows(fh, fmt), batch_size):
+                try:
+                    with transaction.atomic():
+                        created += importer.import_batch(batch)
+                except (KeyError, ValueError, IntegrityError) as exc:
+                    raise CommandError(
+                        f"Batch starting at row {created + 1} failed: {exc!r}. {created} rows were imported."
+                    )
+                if options['verbosity'] >= 2:
+                    self.stdout.write(f"  {created} rows, {created / (time.perf_counter() - start):.0f} rows/sec")
+        finally:
+            if fh is not sys.stdin:
+                fh.close()
+            # Also after a failed batch: the earlier ones are committed.
+            if created:
+                if dataset == 'lawyers':
+                    directory.rebuild()
+                if dataset == 'questions':
+                    duplicates.index_missing()
+                summary.refresh()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"Imported {created} {dataset} in {elapsed:.2f}s ({created / elapsed:.0f} rows/sec).")
+
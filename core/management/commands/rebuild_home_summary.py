@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core import summary
+
+
+class Command(BaseCommand):
+    help = "Recomputes the precomputed homepage summary (latest answers, top lawyers, counters)."
+
+    def handle(self, *args, **options):
+        summary.refresh()
+        home = summary.load()
+        self.stdout.write(
+            f"Home summary rebuilt: {home.answered_count} answered questions, {home.lawyer_count} lawyers."
+        )
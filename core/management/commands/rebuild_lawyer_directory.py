@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core import directory, summary
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the denormalized lawyer directory and specialty counts from LawyerProfile."
+
+    def handle(self, *args, **options):
+        created = directory.rebuild()
+        summary.refresh()
+        self.stdout.write(f"Directory rebuilt with {created} lawyers.")
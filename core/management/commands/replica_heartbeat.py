@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import replicas
+
+
+class Command(BaseCommand):
+    help = (
+        "Stamps the replica heartbeat on the primary database and reports each "
+        "replica's lag. Runs once, or forever with --loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Keep beating.")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds between beats with --loop.")
+
+    def handle(self, *args, loop, interval, **options):
+        while True:
+            replicas.beat()
+            if options['verbosity'] > 1 or not loop:
+                for alias in replicas.replica_aliases():
+                    self.stdout.write(f"{alias}: {self._describe(alias)}")
+            if not loop:
+                return
+            time.sleep(interval)
+
+    @staticmethod
+    def _describe(alias):
+        try:
+            behind = replicas.lag(alias)
+        except Exception as exc:
+            return f"unreachable ({exc})"
+        return "no heartbeat yet" if behind is None else f"{behind:.2f}s behind"
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.mail import send_queued_email
+
+
+class Command(BaseCommand):
+    help = "Delivers queued outbound email. Runs once, or forever with --loop."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--max-attempts', type=int, default=None)
+        parser.add_argument('--loop', action='store_true', help="Keep polling the outbox.")
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds to sleep when the outbox is empty.")
+
+    def handle(self, *args, batch_size, max_attempts, loop, interval, **options):
+        while True:
+            sent, failed = send_queued_email(batch_size=batch_size, max_attempts=max_attempts)
+            if sent or failed:
+                self.stdout.write(f"sent={sent} failed={failed}")
+            if sent + failed < batch_size:
+                if not loop:
+                    return
+                time.sleep(interval)
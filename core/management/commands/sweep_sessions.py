@@ -0,0 +1,52 @@
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes expired sessions from the database in bounded batches. "
+        "Runs once, or forever with --loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0.0,
+                            help="Seconds to pause between batches to let other writers in.")
+        parser.add_argument('--loop', action='store_true', help="Keep sweeping.")
+        parser.add_argument('--interval', type=float, default=3600.0,
+                            help="Seconds to wait between sweeps with --loop.")
+
+    def handle(self, *args, batch_size, sleep, loop, interval, **options):
+        store = import_module(settings.SESSION_ENGINE).SessionStore
+        if not hasattr(store, 'get_model_class'):
+            self.stdout.write(f"{settings.SESSION_ENGINE} keeps no session rows; nothing to sweep.")
+            return
+        model = store.get_model_class()
+        while True:
+            deleted = self._sweep(model, batch_size, sleep)
+            self.stdout.write(f"Deleted {deleted} expired sessions.")
+            if not loop:
+                return
+            time.sleep(interval)
+
+    def _sweep(self, model, batch_size, sleep):
+        # Unlike clearsessions' single DELETE, each batch is a short index
+        # range scan on expire_date plus DELETE ... WHERE session_key IN (...).
+        now = timezone.now()
+        deleted = 0
+        while True:
+            keys = list(
+                model.objects.filter(expire_date__lt=now)
+                .order_by('expire_date')
+                .values_list('session_key', flat=True)[:batch_size]
+            )
+            if keys:
+                deleted += model.objects.filter(session_key__in=keys, expire_date__lt=now).delete()[0]
+            if len(keys) < batch_size:
+                return deleted
+            if sleep:
+                time.sleep(sleep)
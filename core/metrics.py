@@ -0,0 +1,219 @@
+"""
+Per-request timing collection and in-process latency histograms.
+
+core.middleware.ServerTimingMiddleware opens a collector for each request;
+code on the hot path reports into it with ``timed(phase)`` or ``record()``.
+When no request is active these are no-ops, so management commands and the
+email worker pay nothing.
+
+Histograms are kept in process memory. Each worker also writes a snapshot
+of its own to settings.METRICS_DIR, at most every METRICS_FLUSH_SECONDS. The
+scrape endpoint adds up the snapshots of every worker on the host, so the
+numbers Prometheus sees only ever grow, whichever worker answers. Snapshots
+of workers that have exited are folded into one file rather than dropped.
+Clear the directory when the server restarts.
+
+Without METRICS_DIR (a single process, or ``runserver``) the endpoint
+reports the answering process alone; under several gunicorn workers that
+would make successive scrapes look like counter resets.
+"""
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = ContextVar('core_request_timings', default=None)
+_lock = threading.Lock()
+# (view, phase) -> [bucket counts..., sum, count]
+_histograms = {}
+# view -> SQL statements executed
+_query_counts = {}
+# (pid, snapshot file name, monotonic time of the last flush) for this process
+_flushed = [None, None, 0.0]
+
+EXITED_FILE = 'exited.json'
+
+
+def start():
+    """Begins collecting for the current request; returns a token for finish()."""
+    return _current.set({})
+
+
+def finish(token):
+    timings = _current.get()
+    _current.reset(token)
+    return timings
+
+
+def record(phase, seconds, count=1):
+    timings = _current.get()
+    if timings is None:
+        return
+    total, calls = timings.get(phase, (0.0, 0))
+    timings[phase] = (total + seconds, calls + count)
+
+
+@contextmanager
+def timed(phase):
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, time.perf_counter() - start_time)
+
+
+def observe(view, timings, total_seconds):
+    """Adds one finished request to the per-view histograms."""
+    samples = [('total', total_seconds)] + [(phase, seconds) for phase, (seconds, _) in timings.items()]
+    with _lock:
+        for phase, seconds in samples:
+            row = _histograms.get((view, phase))
+            if row is None:
+                row = _histograms[(view, phase)] = [0] * (len(BUCKETS) + 2)
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    row[i] += 1
+            row[-2] += seconds
+            row[-1] += 1
+        _query_counts[view] = _query_counts.get(view, 0) + timings.get('db', (0, 0))[1] + timings.get('session', (0, 0))[1]
+    if settings.METRICS_DIR:
+        flush()
+
+
+# ------------
+# Shared store
+# ------------
+def _dump(histograms, query_counts):
+    return {
+        'histograms': [[view, phase, row] for (view, phase), row in histograms.items()],
+        'queries': query_counts,
+    }
+
+
+def _write(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as fh:
+        json.dump(data, fh)
+    os.replace(tmp, path)
+
+
+def flush(force=False):
+    """Writes this process's numbers to its snapshot in settings.METRICS_DIR."""
+    pid = os.getpid()
+    if _flushed[0] != pid:
+        # First flush, or a forked child: start a fresh, uniquely named snapshot.
+        with _lock:
+            if _flushed[0] is not None:
+                _histograms.clear()
+                _query_counts.clear()
+            _flushed[:] = [pid, f"worker-{pid}-{time.time_ns()}.json", 0.0]
+    now = time.monotonic()
+    if not force and now - _flushed[2] < settings.METRICS_FLUSH_SECONDS:
+        return
+    _flushed[2] = now
+    with _lock:
+        data = _dump({key: list(row) for key, row in _histograms.items()}, dict(_query_counts))
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    _write(os.path.join(settings.METRICS_DIR, _flushed[1]), data)
+
+
+def _add(histograms, query_counts, path):
+    """Adds the snapshot at ``path`` into the two dicts; False if it cannot be read."""
+    try:
+        with open(path) as fh:
+            data = json.load(fh)
+    except (OSError, ValueError):
+        return False
+    for view, phase, row in data['histograms']:
+        current = histograms.get((view, phase))
+        histograms[(view, phase)] = [a + b for a, b in zip(current, row)] if current else row
+    for view, count in data['queries'].items():
+        query_counts[view] = query_counts.get(view, 0) + count
+    return True
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _collect():
+    """Adds up every snapshot in METRICS_DIR, first folding exited workers into EXITED_FILE."""
+    directory = settings.METRICS_DIR
+    flush(force=True)
+    with open(os.path.join(directory, '.lock'), 'w') as lock:
+        # One scrape at a time, so an exited worker is never folded in twice.
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        exited_path = os.path.join(directory, EXITED_FILE)
+        exited = ({}, {})
+        _add(*exited, exited_path)
+        live = []
+        folded = []
+        for name in os.listdir(directory):
+            if name.startswith('worker-') and name.endswith('.json'):
+                if _alive(int(name.split('-')[1])):
+                    live.append(name)
+                elif _add(*exited, os.path.join(directory, name)):
+                    folded.append(name)
+        if folded:
+            _write(exited_path, _dump(*exited))
+            for name in folded:
+                os.remove(os.path.join(directory, name))
+    histograms, query_counts = exited
+    for name in live:
+        _add(histograms, query_counts, os.path.join(directory, name))
+    return histograms, query_counts
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus():
+    """Returns every histogram in the Prometheus text exposition format."""
+    if settings.METRICS_DIR:
+        histograms, query_counts = _collect()
+    else:
+        with _lock:
+            histograms = {key: list(row) for key, row in _histograms.items()}
+            query_counts = dict(_query_counts)
+
+    lines = [
+        "# HELP guardian_request_duration_seconds Request duration by URL name and phase.",
+        "# TYPE guardian_request_duration_seconds histogram",
+    ]
+    for (view, phase), row in sorted(histograms.items()):
+        labels = f'view="{_label(view)}",phase="{_label(phase)}"'
+        for bound, count in zip(BUCKETS, row):
+            lines.append(f'guardian_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f'guardian_request_duration_seconds_bucket{{{labels},le="+Inf"}} {row[-1]}')
+        lines.append(f'guardian_request_duration_seconds_sum{{{labels}}} {row[-2]}')
+        lines.append(f'guardian_request_duration_seconds_count{{{labels}}} {row[-1]}')
+
+    lines += [
+        "# HELP guardian_db_queries_total SQL statements executed, by URL name.",
+        "# TYPE guardian_db_queries_total counter",
+    ]
+    for view, count in sorted(query_counts.items()):
+        lines.append(f'guardian_db_queries_total{{view="{_label(view)}"}} {count}')
+    return "\n".join(lines) + "\n"
@@ -1,7 +1,152 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
 
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils import translation
 from django.utils.deprecation import MiddlewareMixin
+
+from . import language, metrics, replicas
+
+request_logger = logging.getLogger('core.requests')
+
+
 class LanguageSwitcherMiddleware(MiddlewareMixin):
+    """
+    Resolves the site language from ``?lang=`` or the signed language cookie,
+    activates its translation catalog and persists a switch in the cookie.
+    Never touches the session.
+    """
     def process_request(self, request):
-        lang = request.GET.get('lang')
-        if lang in ('en','fr'):
-            request.session['lang'] = lang
+        current = language.from_cookie(request)
+        requested = request.GET.get('lang')
+        if requested in language.LANGUAGES and requested != current:
+            request.set_lang_cookie = True
+            current = requested
+        request.site_lang = current or language.DEFAULT_LANGUAGE
+        translation.activate(request.site_lang)
+        request.LANGUAGE_CODE = request.site_lang
+
+    def process_response(self, request, response):
+        lang = getattr(request, 'site_lang', None)
+        if lang is None:
+            return response
+        if getattr(request, 'set_lang_cookie', False):
+            language.set_language_cookie(response, lang)
+        patch_vary_headers(response, ('Cookie',))
+        # Not for shared caches; see core.language.
+        patch_cache_control(response, private=True)
+        response.headers.setdefault('Content-Language', lang)
+        return response
+
+
+class ReplicaPinningMiddleware:
+    """
+    Tracks whether a request writes to the primary database so core.replicas
+    keeps its later reads, and the client's next few requests, off the read
+    replicas. Goes before SessionMiddleware so that session saves count.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = replicas.begin(request)
+        return replicas.finish(token, self.get_response(request))
+
+    async def __acall__(self, request):
+        token = replicas.begin(request)
+        return replicas.finish(token, await self.get_response(request))
+
+
+def _time_query(execute, sql, params, many, context):
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        # Session reads/writes are reported separately from the view's own queries.
+        phase = 'session' if 'django_session' in sql else 'db'
+        metrics.record(phase, time.perf_counter() - start)
+
+
+class ServerTimingMiddleware:
+    """
+    Times the request, its SQL, template rendering, session access and email
+    queueing. Adds a Server-Timing header, logs one JSON line per request to
+    the ``core.requests`` logger and feeds the /metrics/ histograms.
+    Should be first in MIDDLEWARE so that it wraps everything else.
+    Works in both WSGI and ASGI stacks without forcing a thread switch.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = metrics.start()
+        start = time.perf_counter()
+        try:
+            with self._time_queries():
+                response = self.get_response(request)
+        finally:
+            timings = metrics.finish(token)
+        return self._finish(request, response, timings, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        token = metrics.start()
+        start = time.perf_counter()
+        try:
+            with self._time_queries():
+                response = await self.get_response(request)
+        finally:
+            timings = metrics.finish(token)
+        return self._finish(request, response, timings, time.perf_counter() - start)
+
+    @staticmethod
+    def _time_queries():
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(_time_query))
+        return stack
+
+    def _finish(self, request, response, timings, total):
+        match = request.resolver_match
+        view = (match.url_name or match.view_name) if match else '<unresolved>'
+        metrics.observe(view, timings, total)
+
+        if settings.SERVER_TIMING_HEADER:
+            entries = [
+                f'{phase};dur={seconds * 1000:.2f};desc="{calls}"'
+                for phase, (seconds, calls) in sorted(timings.items())
+            ]
+            entries.append(f'total;dur={total * 1000:.2f}')
+            response['Server-Timing'] = ', '.join(entries)
+
+        if request_logger.isEnabledFor(logging.INFO):
+            request_logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'view': view,
+                'status': response.status_code,
+                'total_ms': round(total * 1000, 2),
+                **{f'{phase}_ms': round(seconds * 1000, 2) for phase, (seconds, _) in timings.items()},
+                **{f'{phase}_count': calls for phase, (_, calls) in timings.items()},
+            }))
+        return response
@@ -0,0 +1,88 @@
+from django.db import migrations
+
+# Full-text index over PublicQuestion title/body/answer_text.
+# SQLite: an external-content FTS5 table kept in sync by triggers.
+# PostgreSQL: weighted tsvector expression indexes, one per site language.
+# Other backends get no index and core.search falls back to icontains.
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE core_publicquestion_fts USING fts5(
+        title, body, answer_text,
+        content='core_publicquestion', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER core_publicquestion_fts_ai AFTER INSERT ON core_publicquestion BEGIN
+        INSERT INTO core_publicquestion_fts(rowid, title, body, answer_text)
+        VALUES (new.id, new.title, new.body, new.answer_text);
+    END
+    """,
+    """
+    CREATE TRIGGER core_publicquestion_fts_ad AFTER DELETE ON core_publicquestion BEGIN
+        INSERT INTO core_publicquestion_fts(core_publicquestion_fts, rowid, title, body, answer_text)
+        VALUES ('delete', old.id, old.title, old.body, old.answer_text);
+    END
+    """,
+    """
+    CREATE TRIGGER core_publicquestion_fts_au AFTER UPDATE OF title, body, answer_text ON core_publicquestion BEGIN
+        INSERT INTO core_publicquestion_fts(core_publicquestion_fts, rowid, title, body, answer_text)
+        VALUES ('delete', old.id, old.title, old.body, old.answer_text);
+        INSERT INTO core_publicquestion_fts(rowid, title, body, answer_text)
+        VALUES (new.id, new.title, new.body, new.answer_text);
+    END
+    """,
+    "INSERT INTO core_publicquestion_fts(core_publicquestion_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS core_publicquestion_fts_au",
+    "DROP TRIGGER IF EXISTS core_publicquestion_fts_ad",
+    "DROP TRIGGER IF EXISTS core_publicquestion_fts_ai",
+    "DROP TABLE IF EXISTS core_publicquestion_fts",
+]
+
+POSTGRES_VECTOR = (
+    "setweight(to_tsvector('{config}', title), 'A') || "
+    "setweight(to_tsvector('{config}', answer_text), 'B') || "
+    "setweight(to_tsvector('{config}', body), 'C')"
+)
+
+POSTGRES_CONFIGS = ('english', 'french')
+
+
+def _execute(schema_editor, statements):
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _execute(schema_editor, SQLITE_FORWARD)
+    elif vendor == 'postgresql':
+        _execute(schema_editor, [
+            f"CREATE INDEX core_pq_search_{config} ON core_publicquestion "
+            f"USING gin (({POSTGRES_VECTOR.format(config=config)}))"
+            for config in POSTGRES_CONFIGS
+        ])
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _execute(schema_editor, SQLITE_REVERSE)
+    elif vendor == 'postgresql':
+        _execute(schema_editor, [
+            f"DROP INDEX IF EXISTS core_pq_search_{config}" for config in POSTGRES_CONFIGS
+        ])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('core', '0002_verificationtoken'),
+    ]
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations, models
+from django.conf import settings
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('core', '0004_outboundemail'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+    operations = [
+        migrations.AddIndex(
+            model_name='lawyerprofile',
+            index=models.Index(condition=models.Q(('approved', True)), fields=['id'], name='core_lawyer_approved_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='publicquestion',
+            index=models.Index(condition=models.Q(('is_answered', True)), fields=['-created_at', '-id'], name='core_pq_answered_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='publicquestion',
+            index=models.Index(fields=['-created_at', '-id'], name='core_pq_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='verificationtoken',
+            index=models.Index(fields=['created_at'], name='core_token_created_idx'),
+        ),
+    ]
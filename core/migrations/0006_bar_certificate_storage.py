@@ -0,0 +1,14 @@
+from django.db import migrations, models
+import core.storage
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('core', '0005_hot_filter_indexes'),
+    ]
+    operations = [
+        migrations.AlterField(
+            model_name='lawyerprofile',
+            name='bar_certificate',
+            field=models.FileField(storage=core.storage.bar_certificate_storage, upload_to='bar_certificates/'),
+        ),
+    ]
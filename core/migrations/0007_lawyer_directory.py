@@ -0,0 +1,58 @@
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils.text import slugify
+
+
+def backfill_directory(apps, schema_editor):
+    LawyerProfile = apps.get_model('core', 'LawyerProfile')
+    Specialty = apps.get_model('core', 'Specialty')
+    LawyerDirectoryEntry = apps.get_model('core', 'LawyerDirectoryEntry')
+    specialties = {}
+    entries = []
+    for lp in LawyerProfile.objects.filter(approved=True).select_related('user').iterator(chunk_size=2000):
+        name = " ".join(lp.specialty.split())[:100] or "Other"
+        slug = slugify(name)[:100] or 'other'
+        if slug not in specialties:
+            specialties[slug], _ = Specialty.objects.get_or_create(slug=slug, defaults={'name': name})
+        specialty = specialties[slug]
+        specialty.lawyer_count += 1
+        entries.append(LawyerDirectoryEntry(
+            lawyer_id=lp.pk, display_name=lp.user.username,
+            specialty=specialty, years_experience=lp.years_experience,
+        ))
+    LawyerDirectoryEntry.objects.bulk_create(entries, batch_size=2000)
+    Specialty.objects.bulk_update(specialties.values(), ['lawyer_count'], batch_size=2000)
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('core', '0006_bar_certificate_storage'),
+    ]
+    operations = [
+        migrations.CreateModel(
+            name='Specialty',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('slug', models.SlugField(max_length=100, unique=True)),
+                ('lawyer_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'specialties',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LawyerDirectoryEntry',
+            fields=[
+                ('lawyer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='directory_entry', serialize=False, to='core.lawyerprofile')),
+                ('display_name', models.CharField(max_length=150)),
+                ('years_experience', models.PositiveIntegerField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('specialty', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='directory_entries', to='core.specialty')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['display_name', 'lawyer'], name='core_dir_name_idx'), models.Index(fields=['years_experience', 'lawyer'], name='core_dir_years_idx'), models.Index(fields=['specialty', 'display_name', 'lawyer'], name='core_dir_spec_name_idx'), models.Index(fields=['specialty', 'years_experience', 'lawyer'], name='core_dir_spec_years_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_directory, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('core', '0007_lawyer_directory'),
+    ]
+    operations = [
+        migrations.AddField(
+            model_name='publicquestion',
+            name='claim_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='publicquestion',
+            name='claimed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='claimed_questions', to='core.lawyerprofile'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('core', '0008_publicquestion_claim'),
+    ]
+    operations = [
+        migrations.AddField(
+            model_name='publicquestion',
+            name='specialty',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='questions', to='core.specialty'),
+        ),
+        migrations.AddIndex(
+            model_name='publicquestion',
+            index=models.Index(condition=models.Q(('is_answered', False)), fields=['specialty', 'created_at', 'id'], name='core_pq_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations, models
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('core', '0009_publicquestion_specialty_queue'),
+    ]
+    operations = [
+        migrations.CreateModel(
+            name='HomeSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('latest_questions', models.JSONField(default=list)),
+                ('lawyers', models.JSONField(default=list)),
+                ('answered_count', models.PositiveIntegerField(default=0)),
+                ('lawyer_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'home summary',
+            },
+        ),
+    ]
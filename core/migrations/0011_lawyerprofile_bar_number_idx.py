@@ -0,0 +1,14 @@
+from django.db import migrations, models
+from django.conf import settings
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('core', '0010_home_summary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+    operations = [
+        migrations.AddIndex(
+            model_name='lawyerprofile',
+            index=models.Index(fields=['bar_number'], name='core_lawyer_bar_idx'),
+        ),
+    ]
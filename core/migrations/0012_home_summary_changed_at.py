@@ -0,0 +1,19 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('core', '0011_lawyerprofile_bar_number_idx'),
+    ]
+    operations = [
+        migrations.AddField(
+            model_name='homesummary',
+            name='lawyers_changed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='homesummary',
+            name='questions_changed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+# core.directory.EXPERIENCE_BANDS as of this migration: (key, min years, max years exclusive)
+BANDS = [('0-4', 0, 5), ('5-9', 5, 10), ('10-19', 10, 20), ('20+', 20, None)]
+
+
+def backfill_band_counts(apps, schema_editor):
+    Specialty = apps.get_model('core', 'Specialty')
+    LawyerDirectoryEntry = apps.get_model('core', 'LawyerDirectoryEntry')
+    specialties = {specialty.pk: specialty for specialty in Specialty.objects.all()}
+    for specialty in specialties.values():
+        specialty.band_counts = {key: 0 for key, _, _ in BANDS}
+    rows = LawyerDirectoryEntry.objects.values_list('specialty_id', 'years_experience')
+    for specialty_id, years in rows.iterator(chunk_size=2000):
+        key = next(key for key, low, high in BANDS if years >= low and (high is None or years < high))
+        specialties[specialty_id].band_counts[key] += 1
+    Specialty.objects.bulk_update(specialties.values(), ['band_counts'], batch_size=2000)
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('core', '0014_replica_heartbeat'),
+    ]
+    operations = [
+        migrations.AddField(
+            model_name='specialty',
+            name='band_counts',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.RunPython(backfill_band_counts, migrations.RunPython.noop),
+    ]
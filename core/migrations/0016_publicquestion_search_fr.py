@@ -0,0 +1,68 @@
+from django.db import migrations
+
+# A second FTS5 table for French on SQLite. The porter tokenizer of the table
+# from migration 0003 stems English only and mangles French words, and FTS5
+# has no French stemmer, so this one folds case and diacritics without
+# stemming; core.search matches French terms by prefix instead.
+# PostgreSQL already has a French index from 0003.
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE core_publicquestion_fts_fr USING fts5(
+        title, body, answer_text,
+        content='core_publicquestion', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER core_publicquestion_fts_fr_ai AFTER INSERT ON core_publicquestion BEGIN
+        INSERT INTO core_publicquestion_fts_fr(rowid, title, body, answer_text)
+        VALUES (new.id, new.title, new.body, new.answer_text);
+    END
+    """,
+    """
+    CREATE TRIGGER core_publicquestion_fts_fr_ad AFTER DELETE ON core_publicquestion BEGIN
+        INSERT INTO core_publicquestion_fts_fr(core_publicquestion_fts_fr, rowid, title, body, answer_text)
+        VALUES ('delete', old.id, old.title, old.body, old.answer_text);
+    END
+    """,
+    """
+    CREATE TRIGGER core_publicquestion_fts_fr_au AFTER UPDATE OF title, body, answer_text ON core_publicquestion BEGIN
+        INSERT INTO core_publicquestion_fts_fr(core_publicquestion_fts_fr, rowid, title, body, answer_text)
+        VALUES ('delete', old.id, old.title, old.body, old.answer_text);
+        INSERT INTO core_publicquestion_fts_fr(rowid, title, body, answer_text)
+        VALUES (new.id, new.title, new.body, new.answer_text);
+    END
+    """,
+    "INSERT INTO core_publicquestion_fts_fr(core_publicquestion_fts_fr) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS core_publicquestion_fts_fr_au",
+    "DROP TRIGGER IF EXISTS core_publicquestion_fts_fr_ad",
+    "DROP TRIGGER IF EXISTS core_publicquestion_fts_fr_ai",
+    "DROP TABLE IF EXISTS core_publicquestion_fts_fr",
+]
+
+
+def _execute(schema_editor, statements):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in statements:
+            schema_editor.execute(sql)
+
+
+def create_search_index(apps, schema_editor):
+    _execute(schema_editor, SQLITE_FORWARD)
+
+
+def drop_search_index(apps, schema_editor):
+    _execute(schema_editor, SQLITE_REVERSE)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('core', '0015_specialty_band_counts'),
+    ]
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,6 +1,12 @@
+from datetime import timedelta
 
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .storage import bar_certificate_storage
 
 class PublicQuestion(models.Model):
     name = models.CharField(max_length=100, blank=True)
@@ -11,24 +17,114 @@ class PublicQuestion(models.Model):
     is_answered = models.BooleanField(default=False)
     answer_text = models.TextField(blank=True)
     answered_by = models.ForeignKey('LawyerProfile', null=True, blank=True, on_delete=models.SET_NULL)
+    # Short-lived lease taken by the lawyer who opened the answer form; see core.answering.
+    claimed_by = models.ForeignKey('LawyerProfile', null=True, blank=True, on_delete=models.SET_NULL,
+                                   related_name='claimed_questions')
+    claim_expires_at = models.DateTimeField(null=True, blank=True)
+    # Routes the question to lawyers of this practice area; unset means the general queue.
+    specialty = models.ForeignKey('Specialty', null=True, blank=True, on_delete=models.SET_NULL,
+                                  related_name='questions')
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Answered-only feed and homepage. Partial rather than (is_answered, ...)
+            # because Django filters booleans as a bare column, which SQLite can
+            # only match against a partial index predicate.
+            models.Index(fields=['-created_at', '-id'], condition=models.Q(is_answered=True),
+                         name='core_pq_answered_created_idx'),
+            # Lawyers' feed over every question.
+            models.Index(fields=['-created_at', '-id'], name='core_pq_created_idx'),
+            # Per-specialty work queue, oldest first; only the unanswered backlog is indexed.
+            models.Index(fields=['specialty', 'created_at', 'id'], condition=models.Q(is_answered=False),
+                         name='core_pq_queue_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets core.signals move the answered counter by the change a save makes.
+        if 'is_answered' in field_names:
+            instance._loaded_is_answered = instance.is_answered
+        return instance
+
+    @property
+    def claim_active(self):
+        return self.claim_expires_at is not None and self.claim_expires_at > timezone.now()
+
 class LawyerProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     specialty = models.CharField(max_length=200)
     years_experience = models.PositiveIntegerField()
     bar_number = models.CharField(max_length=100)
-    bar_certificate = models.FileField(upload_to='bar_certificates/')
+    bar_certificate = models.FileField(upload_to='bar_certificates/', storage=bar_certificate_storage)
     approved = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(approved=True), name='core_lawyer_approved_idx'),
+            # Admin search by bar number.
+            models.Index(fields=['bar_number'], name='core_lawyer_bar_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} ({self.specialty})"
 
+class Specialty(models.Model):
+    """Normalized practice area; LawyerProfile.specialty free text maps onto it by slug."""
+    name = models.CharField(max_length=100)
+    slug = models.SlugField(max_length=100, unique=True)
+    lawyer_count = models.PositiveIntegerField(default=0)  # approved lawyers, kept by core.directory
+    band_counts = models.JSONField(default=dict)  # approved lawyers per directory experience band, likewise
+
+    class Meta:
+        ordering = ['name']
+        verbose_name_plural = 'specialties'
+
+    def __str__(self):
+        return self.name
+
+    @staticmethod
+    def _normalize(name):
+        name = " ".join(name.split())[:100] or "Other"
+        return name, slugify(name)[:100] or 'other'
+
+    @classmethod
+    def for_name(cls, name):
+        name, slug = cls._normalize(name)
+        specialty, _ = cls.objects.get_or_create(slug=slug, defaults={'name': name})
+        return specialty
+
+    @classmethod
+    def lookup(cls, name):
+        """Like for_name() but never creates; None when the taxonomy has no match."""
+        return cls.objects.filter(slug=cls._normalize(name)[1]).first()
+
+class LawyerDirectoryEntry(models.Model):
+    """
+    Read-optimized public card for an approved lawyer, maintained by
+    core.directory so the directory never joins User or LawyerProfile.
+    """
+    lawyer = models.OneToOneField(LawyerProfile, primary_key=True, on_delete=models.CASCADE, related_name='directory_entry')
+    display_name = models.CharField(max_length=150)
+    specialty = models.ForeignKey(Specialty, on_delete=models.PROTECT, related_name='directory_entries')
+    years_experience = models.PositiveIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['display_name', 'lawyer'], name='core_dir_name_idx'),
+            models.Index(fields=['years_experience', 'lawyer'], name='core_dir_years_idx'),
+            models.Index(fields=['specialty', 'display_name', 'lawyer'], name='core_dir_spec_name_idx'),
+            models.Index(fields=['specialty', 'years_experience', 'lawyer'], name='core_dir_spec_years_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.display_name} ({self.specialty})"
+
 class CustomerProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     def __str__(self):
@@ -39,5 +135,108 @@ class VerificationToken(models.Model):
     token = models.CharField(max_length=64, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='core_token_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.token}"
+
+    @staticmethod
+    def expiry_cutoff():
+        """Tokens created before this moment are expired."""
+        return timezone.now() - timedelta(hours=settings.VERIFICATION_TOKEN_TTL_HOURS)
+
+    @classmethod
+    def expired(cls):
+        return cls.objects.filter(created_at__lt=cls.expiry_cutoff())
+
+    @property
+    def is_expired(self):
+        return self.created_at < self.expiry_cutoff()
+
+class OutboundEmail(models.Model):
+    """
+    Outbox row for an email that the send_queued_email worker delivers later,
+    so request handlers never wait on the mail server.
+    """
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (SENT, 'Sent'), (FAILED, 'Failed')]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='core_outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)}"
+
+
+class HomeSummary(models.Model):
+    """
+    The homepage's content, precomputed into a single row by core.summary so
+    rendering the page is one primary-key lookup. The *_changed_at stamps
+    double as the public pages' HTTP validators (core.conditional).
+    """
+    latest_questions = models.JSONField(default=list)
+    lawyers = models.JSONField(default=list)
+    answered_count = models.PositiveIntegerField(default=0)
+    lawyer_count = models.PositiveIntegerField(default=0)
+    # Last change to an answered question / to the lawyer directory.
+    questions_changed_at = models.DateTimeField(default=timezone.now)
+    lawyers_changed_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'home summary'
+
+    def __str__(self):
+        return f"Home summary ({self.updated_at:%Y-%m-%d %H:%M})"
+
+
+class QuestionSignature(models.Model):
+    """MinHash signature of an answered question's title and body; see core.duplicates."""
+    question = models.OneToOneField(PublicQuestion, on_delete=models.CASCADE, primary_key=True,
+                                    related_name='signature')
+    minhash = models.BinaryField()
+
+
+class QuestionBucket(models.Model):
+    """
+    One LSH band of a QuestionSignature. Questions that share a key in any
+    band are near-duplicate candidates.
+    """
+    key = models.BigIntegerField()
+    question = models.ForeignKey(PublicQuestion, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        indexes = [
+            # Covering, so a lookup never touches the table.
+            models.Index(fields=['key', 'question'], name='core_dup_bucket_idx'),
+        ]
+
+
+class ReplicaHeartbeat(models.Model):
+    """
+    A single row stamped on the primary by the replica_heartbeat command;
+    how old it looks on a replica is that replica's lag (core.replicas).
+    """
+    beat_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Replica heartbeat ({self.beat_at:%Y-%m-%d %H:%M:%S})"
@@ -0,0 +1,130 @@
+"""
+Whole-page cache for anonymous visitors.
+
+For anonymous users, public pages only vary by language (see
+core.language), so the rendered response is cached under (host and path,
+lang, auth state), plus the ETag core.conditional computed for the request
+when there is one. The host is there because the JSON API writes absolute
+links into its bodies. Entries are grouped under a generation number;
+core.signals bumps it whenever content shown on those pages changes, which
+drops every cached page at once.
+
+The default CACHE_BACKEND is local memory, which is per process: the
+generation lives in each worker, so invalidate() only reaches the worker
+that ran it and the others keep their pages until PAGE_CACHE_TIMEOUT.
+Pages behind core.conditional are keyed by their ETag as well, so those
+re-render once the summary stamps move; the rest (e.g. about) wait for the
+timeout. Point CACHE_BACKEND at Redis or a file cache to share the entries
+and the generation between workers.
+This is the only shared copy: responses are Cache-Control: private (see
+core.middleware.LanguageSwitcherMiddleware).
+
+A page rendered from a read replica (core.replicas) within
+REPLICA_MAX_LAG_SECONDS of an invalidation may predate the change, so it is
+served but not stored.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from . import replicas
+from .language import get_language
+
+GENERATION_KEY = 'pagecache:generation'
+
+
+def _cache():
+    return caches[settings.PAGE_CACHE_ALIAS]
+
+
+def _generation(cache):
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        generation = time.time_ns()
+        cache.add(GENERATION_KEY, generation, None)
+    return generation
+
+
+def invalidate():
+    """Drops every cached page by moving to a new generation."""
+    _cache().set(GENERATION_KEY, time.time_ns(), None)
+
+
+def _cache_key(cache, request):
+    url = f"{request.get_host()}{request.get_full_path()}:{getattr(request, 'content_etag', '')}"
+    auth = 'auth' if request.user.is_authenticated else 'anon'
+    return f"pagecache:{_generation(cache)}:{get_language(request)}:{auth}:{hashlib.md5(url.encode()).hexdigest()}"
+
+
+def _is_cacheable_request(request):
+    return (
+        request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        # Flashed messages are rendered into the page and must not be shared.
+        and not len(messages.get_messages(request))
+    )
+
+
+def _is_cacheable_response(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+    )
+
+
+def _lookup(request):
+    """Returns (key, cached entry) for a cacheable request, or (None, None)."""
+    if not _is_cacheable_request(request):
+        return None, None
+    cache = _cache()
+    key = _cache_key(cache, request)
+    return key, cache.get(key)
+
+
+def _may_predate_invalidation(cache):
+    if replicas.serving_replica() is None:
+        return False
+    return time.time_ns() - _generation(cache) < settings.REPLICA_MAX_LAG_SECONDS * 1_000_000_000
+
+
+def _store(request, key, response):
+    if _is_cacheable_response(request, response) and not _may_predate_invalidation(_cache()):
+        _cache().set(key, (response.content, response['Content-Type']), settings.PAGE_CACHE_TIMEOUT)
+
+
+def cache_anonymous_page(view):
+    """
+    Serves ``view`` from the page cache for anonymous GET/HEAD requests.
+    Works on both sync and async views.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapped(request, *args, **kwargs):
+            # Resolving the user can touch the session table.
+            key, cached = await sync_to_async(_lookup)(request)
+            if cached is not None:
+                return HttpResponse(cached[0], content_type=cached[1])
+            response = await view(request, *args, **kwargs)
+            if key is not None:
+                await sync_to_async(_store)(request, key, response)
+            return response
+        return async_wrapped
+
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        key, cached = _lookup(request)
+        if cached is not None:
+            return HttpResponse(cached[0], content_type=cached[1])
+        response = view(request, *args, **kwargs)
+        if key is not None:
+            _store(request, key, response)
+        return response
+    return wrapped
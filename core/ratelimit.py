@@ -0,0 +1,88 @@
+"""
+Token-bucket throttling for the credential endpoints.
+
+Each POST to a throttled view takes one token from a bucket keyed on the
+client IP and one keyed on the submitted username (or email), so a burst
+against one account and a burst from one address are both cut off. A
+request that finds either bucket empty gets a bare 429 before the view
+runs: no template, no password hashing and no database access.
+
+Buckets live in settings.RATELIMIT_CACHE_ALIAS so every worker shares
+them when that cache is shared (Redis). If the cache cannot be reached the
+buckets fall back to this process's memory rather than failing open. The
+read-modify-write is not atomic, so concurrent requests can occasionally
+overdraw a bucket by a token or two.
+"""
+import hashlib
+import logging
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+_local = LocMemCache('core.ratelimit', {'OPTIONS': {'MAX_ENTRIES': 10000}})
+
+
+def client_ip(request):
+    if settings.RATELIMIT_TRUST_X_FORWARDED_FOR:
+        # The last hop is the address our own proxy saw; earlier ones are client-supplied.
+        forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '').rsplit(',', 1)[-1].strip()
+        if forwarded:
+            return forwarded
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _take(cache, key, capacity, per_second, now):
+    """Takes one token; returns seconds until one is available (0 on success)."""
+    tokens, stamp = cache.get(key) or (capacity, now)
+    tokens = min(capacity, tokens + (now - stamp) * per_second)
+    if tokens < 1:
+        return (1 - tokens) / per_second
+    cache.set(key, (tokens - 1, now), math.ceil(capacity / per_second))
+    return 0
+
+
+def _wait(scope, identities):
+    capacity, per_minute = settings.RATE_LIMITS[scope]
+    per_second = per_minute / 60
+    now = time.time()
+    wait = 0
+    for kind, value in identities:
+        key = f"ratelimit:{scope}:{kind}:{hashlib.md5(value.encode()).hexdigest()}"
+        try:
+            wait = _take(caches[settings.RATELIMIT_CACHE_ALIAS], key, capacity, per_second, now)
+        except Exception:
+            logger.warning("Rate limit cache unavailable; using process-local buckets.", exc_info=True)
+            wait = _take(_local, key, capacity, per_second, now)
+        if wait:
+            break
+    return wait
+
+
+def ratelimit(scope, field=None):
+    """
+    Throttles POSTs to the decorated view with the settings.RATE_LIMITS[scope]
+    bucket, keyed on the client IP and, if given, the POSTed ``field``.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method == 'POST' and settings.RATELIMIT_ENABLED:
+                identities = [('ip', client_ip(request))]
+                if field and request.POST.get(field):
+                    identities.append((field, request.POST[field].strip().lower()[:254]))
+                wait = _wait(scope, identities)
+                if wait:
+                    response = HttpResponse("Too many attempts. Please wait and try again.",
+                                            status=429, content_type='text/plain')
+                    response['Retry-After'] = str(math.ceil(wait))
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapped
+    return decorator
@@ -0,0 +1,191 @@
+"""
+Read replicas for the public read-only views.
+
+When settings.DATABASE_REPLICA_URLS lists replica databases, ReplicaRouter
+sends the reads of views wrapped in replica_reads() (home, public_questions,
+lawyers_list and the JSON API) to one of them. Everything else, including
+every write and every read outside those views, stays on the primary.
+
+Read-your-writes: ReplicaPinningMiddleware (core.middleware) notes any
+write a request makes. Later reads in that request stay on the primary. The
+response also gets a PIN_COOKIE that keeps the client on the primary for
+settings.REPLICA_PIN_SECONDS, long enough for the replicas to catch up.
+
+Lag: the ``replica_heartbeat --loop`` command stamps ReplicaHeartbeat on
+the primary every second or so. Each worker reads that stamp back from each
+replica at most every settings.REPLICA_LAG_CHECK_SECONDS. A replica that is
+more than settings.REPLICA_MAX_LAG_SECONDS behind, or cannot be reached, is
+skipped until a later check finds it current. With no healthy replica (or no
+heartbeat running), reads go to the primary.
+"""
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+from .models import ReplicaHeartbeat
+
+logger = logging.getLogger(__name__)
+
+PIN_COOKIE = 'db_pin'
+HEARTBEAT_PK = 1
+
+# Per request: {'read_only', 'pinned', 'wrote', 'alias'}. A dict rather than
+# separate variables so writes made in sync_to_async threads are seen here.
+_state = ContextVar('core.replicas.state', default=None)
+# alias -> (monotonic time of the last check, healthy)
+_health = {}
+
+
+def replica_aliases():
+    return [alias for alias in connections if alias != DEFAULT_DB_ALIAS]
+
+
+def _new_state(pinned=False):
+    return {'read_only': False, 'pinned': pinned, 'wrote': False, 'alias': None}
+
+
+# ---
+# Lag
+# ---
+def lag(alias):
+    """Seconds ``alias`` is behind the primary's last heartbeat, or None if it has none."""
+    beat_at = ReplicaHeartbeat.objects.using(alias).filter(pk=HEARTBEAT_PK).values_list('beat_at', flat=True).first()
+    if beat_at is None:
+        return None
+    return max(0.0, (timezone.now() - beat_at).total_seconds())
+
+
+def beat():
+    """Stamps the heartbeat on the primary."""
+    now = timezone.now()
+    if not ReplicaHeartbeat.objects.filter(pk=HEARTBEAT_PK).update(beat_at=now):
+        ReplicaHeartbeat.objects.update_or_create(pk=HEARTBEAT_PK, defaults={'beat_at': now})
+    return now
+
+
+def _check(alias, was_healthy):
+    try:
+        behind = lag(alias)
+    except Exception:
+        logger.warning("Replica %s is unreachable; reading from the primary.", alias, exc_info=True)
+        return False
+    ok = behind is not None and behind <= settings.REPLICA_MAX_LAG_SECONDS
+    # Only log changes, not every check.
+    if was_healthy and not ok:
+        logger.warning("Replica %s is %s; reading from the primary.", alias,
+                       'missing its heartbeat' if behind is None else f'{behind:.1f}s behind')
+    elif ok and not was_healthy:
+        logger.info("Replica %s has caught up.", alias)
+    return ok
+
+
+def healthy(alias):
+    checked_at, ok = _health.get(alias, (None, True))
+    now = time.monotonic()
+    if checked_at is None or now - checked_at >= settings.REPLICA_LAG_CHECK_SECONDS:
+        ok = _check(alias, ok)
+        _health[alias] = (now, ok)
+    return ok
+
+
+def _choose():
+    candidates = [alias for alias in replica_aliases() if healthy(alias)]
+    return random.choice(candidates) if candidates else DEFAULT_DB_ALIAS
+
+
+# ------
+# Router
+# ------
+class ReplicaRouter:
+    """Reads inside replica_reads() go to a healthy replica; everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state['read_only'] or state['pinned'] or state['wrote']:
+            return None
+        if state['alias'] is None:
+            # One replica for the whole request, so its reads are consistent.
+            state['alias'] = _choose()
+        return state['alias']
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def serving_replica():
+    """The replica this request has read from, or None."""
+    state = _state.get()
+    alias = state and state['alias']
+    return alias if alias and alias != DEFAULT_DB_ALIAS else None
+
+
+# -------------------
+# Request integration
+# -------------------
+def begin(request):
+    """Starts tracking ``request``; returns a token for finish()."""
+    return _state.set(_new_state(pinned=PIN_COOKIE in request.COOKIES))
+
+
+def finish(token, response):
+    state = _state.get()
+    _state.reset(token)
+    if state['wrote']:
+        response.set_cookie(PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                            httponly=True, samesite='Lax', secure=not settings.DEBUG)
+    return response
+
+
+@contextmanager
+def _read_only():
+    state = _state.get()
+    token = None
+    if state is None:
+        token = _state.set(state := _new_state())
+    previous = state['read_only']
+    state['read_only'] = True
+    try:
+        yield
+    finally:
+        state['read_only'] = previous
+        if token is not None:
+            _state.reset(token)
+
+
+def replica_reads(view):
+    """
+    Lets ReplicaRouter serve ``view``'s reads from a replica. Only for views
+    that tolerate data up to settings.REPLICA_MAX_LAG_SECONDS old. Put it
+    outermost, so the HTTP validators, the page cache and the body all read
+    the same database. Works on both sync and async views.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapped(request, *args, **kwargs):
+            with _read_only():
+                return await view(request, *args, **kwargs)
+        return async_wrapped
+
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        with _read_only():
+            return view(request, *args, **kwargs)
+    return wrapped
@@ -0,0 +1,122 @@
+"""
+Full-text search over public questions.
+
+The index itself lives in the database (see migrations 0003 and 0016): FTS5
+tables on SQLite and per-language tsvector GIN indexes on PostgreSQL. Both
+are maintained by the database on every insert/update, so nothing here has
+to run on save.
+
+Languages: PostgreSQL stems with the english or french configuration.
+SQLite has English stemming only (porter), so French searches use a second,
+unstemmed table and match each term as a prefix, which catches most plurals
+and verb endings.
+
+Ranking: bm25 on SQLite comes from the FTS5 index. ts_rank on PostgreSQL has
+to re-read and re-parse each row's text, so only the newest RANK_CANDIDATES
+matches are ranked; the GIN index finds the matches, without reading text.
+check_query_plans verifies that both engines' queries use their index.
+"""
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+
+from .models import PublicQuestion
+
+# Site language -> PostgreSQL text search configuration.
+SEARCH_CONFIGS = {'en': 'english', 'fr': 'french'}
+# Site language -> (SQLite FTS5 table, match terms as prefixes)
+SQLITE_TABLES = {'en': ('core_publicquestion_fts', False), 'fr': ('core_publicquestion_fts_fr', True)}
+
+# Must match the indexed expression in migration 0003 exactly, otherwise
+# PostgreSQL will not use the GIN index.
+POSTGRES_VECTOR = (
+    "setweight(to_tsvector('{config}', title), 'A') || "
+    "setweight(to_tsvector('{config}', answer_text), 'B') || "
+    "setweight(to_tsvector('{config}', body), 'C')"
+)
+
+MAX_TERMS = 8
+RANK_CANDIDATES = 1000
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _terms(query):
+    return _WORD_RE.findall(query or "")[:MAX_TERMS]
+
+
+def index_name(vendor, lang):
+    """The FTS table or GIN index that search_sql(vendor, ..., lang) must use."""
+    if vendor == 'sqlite':
+        return SQLITE_TABLES.get(lang, SQLITE_TABLES['en'])[0]
+    return f"core_pq_search_{SEARCH_CONFIGS.get(lang, 'english')}"
+
+
+def _sqlite_sql(terms, lang, answered_only, limit):
+    table, prefix = SQLITE_TABLES.get(lang, SQLITE_TABLES['en'])
+    # Quote every term so user input can never be parsed as FTS5 syntax.
+    star = '*' if prefix else ''
+    match = " ".join(f'"{term}"{star}' for term in terms)
+    answered = "AND q.is_answered" if answered_only else ""
+    sql = f"""
+        SELECT q.id FROM {table}
+        JOIN core_publicquestion q ON q.id = {table}.rowid
+        WHERE {table} MATCH %s {answered}
+        ORDER BY bm25({table}, 10.0, 1.0, 4.0)
+        LIMIT %s
+    """
+    return sql, [match, limit]
+
+
+def _postgres_sql(terms, lang, answered_only, limit):
+    config = SEARCH_CONFIGS.get(lang, 'english')
+    vector = POSTGRES_VECTOR.format(config=config)
+    answered = "AND is_answered" if answered_only else ""
+    # MATERIALIZED keeps the planner from pushing ORDER BY id LIMIT into the
+    # match, where it could walk the primary key and parse every row instead.
+    sql = f"""
+        WITH matches AS MATERIALIZED (
+            SELECT id FROM core_publicquestion
+            WHERE ({vector}) @@ plainto_tsquery('{config}', %s) {answered}
+        ), candidates AS (
+            SELECT id FROM matches ORDER BY id DESC LIMIT %s
+        )
+        SELECT id FROM core_publicquestion JOIN candidates USING (id), plainto_tsquery('{config}', %s) query
+        ORDER BY ts_rank({vector}, query) DESC, id DESC
+        LIMIT %s
+    """
+    text = " ".join(terms)
+    return sql, [text, RANK_CANDIDATES, text, limit]
+
+
+def search_sql(vendor, terms, lang='en', answered_only=True, limit=20):
+    """(sql, params) selecting the ids of the best matches on ``vendor`` ('sqlite' or 'postgresql')."""
+    build = _sqlite_sql if vendor == 'sqlite' else _postgres_sql
+    return build(terms, lang, answered_only, limit)
+
+
+def search_questions(query, lang='en', answered_only=True, limit=20):
+    """
+    Returns up to ``limit`` PublicQuestions matching ``query``, best match first.
+    ``lang`` picks the stemming language where the backend supports it.
+    """
+    terms = _terms(query)
+    if not terms:
+        return []
+
+    using = router.db_for_read(PublicQuestion)
+    vendor = connections[using].vendor
+    if vendor not in ('sqlite', 'postgresql'):
+        qs = PublicQuestion.objects.using(using).select_related('answered_by__user')
+        for term in terms:
+            qs = qs.filter(Q(title__icontains=term) | Q(body__icontains=term) | Q(answer_text__icontains=term))
+        if answered_only:
+            qs = qs.filter(is_answered=True)
+        return list(qs[:limit])
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(*search_sql(vendor, terms, lang, answered_only, limit))
+        ids = [row[0] for row in cursor.fetchall()]
+
+    by_id = PublicQuestion.objects.using(using).select_related('answered_by__user').in_bulk(ids)
+    return [by_id[pk] for pk in ids if pk in by_id]
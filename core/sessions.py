@@ -0,0 +1,41 @@
+"""
+Session engine: Django's cached_db with a bounded cache lifetime.
+
+Reads are served from the ``sessions`` cache and fall back to django_session
+on a miss; writes go to both. Stock cached_db keeps the cached copy for the
+whole session age; here it lives at most settings.SESSION_CACHE_MAX_AGE
+seconds, so an entry the cache failed to drop (a lost delete, a key written
+back by a racing request) cannot outlive that window.
+
+Only safe with a cache every worker shares: with a per-process one, a worker
+keeps serving a session that another worker has logged out. Settings only
+select this engine when SESSION_CACHE_BACKEND is Redis or Memcached.
+
+Expired rows are removed by ``python manage.py sweep_sessions``.
+"""
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+
+
+class SessionStore(CachedDBStore):
+    def _cache_timeout(self, expiry_age):
+        return max(0, min(expiry_age, settings.SESSION_CACHE_MAX_AGE))
+
+    def load(self):
+        try:
+            data = self._cache.get(self.cache_key)
+        except Exception:
+            # Same as cached_db: invalid keys on some backends reset the session.
+            data = None
+        if data is None:
+            s = self._get_session_from_db()
+            if not s:
+                return {}
+            data = self.decode(s.session_data)
+            self._cache.set(self.cache_key, data, self._cache_timeout(self.get_expiry_age(expiry=s.expire_date)))
+        return data
+
+    def save(self, must_create=False):
+        DBStore.save(self, must_create)
+        self._cache.set(self.cache_key, self._session, self._cache_timeout(self.get_expiry_age()))
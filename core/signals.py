@@ -0,0 +1,67 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from django.contrib.auth.models import User
+
+from . import directory, duplicates, summary
+from .models import LawyerDirectoryEntry, LawyerProfile, PublicQuestion
+
+
+def _answered_delta(instance, created):
+    """How a save of ``instance`` moved the answered count, or None if its previous state is unknown."""
+    before = False if created else getattr(instance, '_loaded_is_answered', None)
+    instance._loaded_is_answered = instance.is_answered
+    if before is None:
+        return None
+    return int(instance.is_answered) - int(before)
+
+
+@receiver(post_save, sender=PublicQuestion)
+def question_saved(sender, instance, created, **kwargs):
+    # New unanswered questions are invisible to anonymous visitors and the
+    # homepage counters.
+    if instance.is_answered or not created:
+        delta = _answered_delta(instance, created)
+        # Saved without being loaded first (rare): recount instead.
+        transaction.on_commit(summary.refresh if delta is None else partial(summary.refresh_questions, delta))
+        # Only answered questions are in the duplicate index; index() also
+        # drops one that is no longer answered.
+        transaction.on_commit(partial(duplicates.index, instance.pk))
+
+
+@receiver(post_delete, sender=PublicQuestion)
+def question_deleted(sender, instance, **kwargs):
+    if getattr(instance, '_loaded_is_answered', instance.is_answered):
+        transaction.on_commit(partial(summary.refresh_questions, -1))
+
+
+@receiver(post_save, sender=LawyerProfile)
+def lawyer_saved(sender, instance, **kwargs):
+    # Approval, un-approval and profile edits all change the public directory.
+    def refresh():
+        summary.refresh_lawyers(directory.refresh_lawyers([instance.pk]))
+    transaction.on_commit(refresh)
+
+
+@receiver(post_delete, sender=LawyerProfile)
+def lawyer_deleted(sender, instance, **kwargs):
+    # The directory entry is removed by the cascade; only the facet counts move.
+    # Both sides change: their answers lose the "answered by" name.
+    def refresh():
+        directory.recount_specialties()
+        summary.update(questions=True, lawyers=True, lawyer_delta=-1 if instance.approved else 0)
+    transaction.on_commit(refresh)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login', 'password'}:
+        return
+    if LawyerDirectoryEntry.objects.filter(lawyer__user=instance).exclude(display_name=instance.username).update(
+        display_name=instance.username
+    ):
+        # Both the directory card and "answered by" show the username.
+        transaction.on_commit(partial(summary.update, questions=True, lawyers=True))
@@ -0,0 +1,50 @@
+"""
+Static asset build, run by collectstatic.
+
+StaticFilesStorage extends whitenoise's CompressedManifestStaticFilesStorage,
+which fingerprints every file and writes gzip (level 9) and, when the brotli
+package is installed, Brotli (quality 11) copies for whitenoise to serve.
+On top of that, CSS is minified as it is written out.
+
+Fingerprinted files never change under the same URL, so whitenoise serves
+them with a far-future ``immutable`` Cache-Control and repeat visits make no
+requests for them at all.
+"""
+import re
+
+from django.core.files.base import ContentFile
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+_COMMENT_RE = re.compile(r'/\*(?!!).*?\*/', re.S)
+_STRING_RE = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'')
+_SPACE_RE = re.compile(r'\s+')
+# Whitespace next to these never matters. Not "+", "-" or "(", which calc()
+# and media queries need spaced, and not before ":", which would turn
+# ".a :hover" into ".a:hover".
+_PUNCTUATION_RE = re.compile(r'\s*([{};,>])\s*|:\s+')
+
+
+def _minify_segment(css):
+    css = _SPACE_RE.sub(' ', css)
+    return _PUNCTUATION_RE.sub(lambda m: m.group(1) if m.group(1) else ':', css)
+
+
+def minify_css(css):
+    """Drops comments (except /*! ... */), redundant whitespace and final semicolons."""
+    css = _COMMENT_RE.sub('', css)
+    parts, pos = [], 0
+    # String literals are copied through untouched.
+    for match in _STRING_RE.finditer(css):
+        parts.append(_minify_segment(css[pos:match.start()]))
+        parts.append(match.group())
+        pos = match.end()
+    parts.append(_minify_segment(css[pos:]))
+    return ''.join(parts).replace(';}', '}').strip()
+
+
+class StaticFilesStorage(CompressedManifestStaticFilesStorage):
+    def _save(self, name, content):
+        if name.endswith('.css'):
+            # chunks() rewinds first; the manifest storage hands over files it has already read.
+            content = ContentFile(minify_css(b''.join(content.chunks()).decode('utf-8')).encode('utf-8'))
+        return super()._save(name, content)
@@ -0,0 +1,69 @@
+import hashlib
+import mimetypes
+import posixpath
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, storages
+from django.http import FileResponse, Http404, HttpResponse
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores each file under the SHA-256 of its content,
+    e.g. ``bar_certificates/ab/ab12...ef.pdf``. Uploading the same file twice
+    reuses the existing copy instead of writing another one.
+    """
+    def save(self, name, content, max_length=None):
+        digest = getattr(content, 'sha256', None) or self._hash(content)
+        directory, filename = posixpath.split(name.replace('\\', '/'))
+        extension = posixpath.splitext(filename)[1].lower()
+        name = posixpath.join(directory, digest[:2], digest + extension)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+    @staticmethod
+    def _hash(content):
+        hasher = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks() if hasattr(content, 'chunks') else iter(lambda: content.read(65536), b''):
+            hasher.update(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        return hasher.hexdigest()
+
+
+def bar_certificate_storage():
+    return storages['bar_certificates']
+
+
+def sendfile_response(storage, name):
+    """
+    Serves a stored file without Python reading it.
+
+    With SENDFILE_MODE = "x-accel-redirect" (nginx) or "x-sendfile"
+    (Apache/lighttpd), the front-end server streams the file. Otherwise a
+    FileResponse is returned, which gunicorn sends through wsgi.file_wrapper,
+    i.e. sendfile(2). x-sendfile needs a local path, so files on a storage
+    without one (S3 and the like) are streamed with FileResponse instead.
+    """
+    if not storage.exists(name):
+        raise Http404
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    path = None
+    if settings.SENDFILE_MODE == 'x-sendfile':
+        try:
+            path = storage.path(name)
+        except NotImplementedError:
+            pass
+    if settings.SENDFILE_MODE == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.SENDFILE_URL_PREFIX + name
+    elif path is not None:
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+    else:
+        response = FileResponse(storage.open(name, 'rb'), content_type=content_type)
+    response['Content-Disposition'] = f'inline; filename="{posixpath.basename(name)}"'
+    return response
@@ -0,0 +1,132 @@
+"""
+Precomputed homepage content.
+
+HomeSummary is a single row holding everything the homepage shows: the
+latest answered questions, the most experienced directory lawyers and the
+site-wide counters. The home view reads the row by primary key and never
+runs the underlying queries itself.
+
+Keeping it current costs the same whatever the archive size. After a commit,
+core.signals, core.answering and the admin call refresh_questions() or
+refresh_lawyers() (update() for both). Those recompute only the list that
+changed, from LIMITed index-backed queries, move the counters by the
+caller's delta with F() and drop the page cache. rebuild() recounts
+everything; it is used when the row is missing and by the bulk commands
+(rebuild_home_summary, import_data, rebuild_lawyer_directory) through
+refresh().
+
+Each change also stamps which side changed (questions_changed_at,
+lawyers_changed_at); core.conditional derives ETag and Last-Modified from
+those stamps.
+"""
+from asgiref.sync import sync_to_async
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django.utils.text import Truncator
+
+from . import pagecache
+from .models import HomeSummary, LawyerDirectoryEntry, PublicQuestion
+
+SUMMARY_PK = 1
+LATEST_QUESTIONS = 5
+TOP_LAWYERS = 6
+EXCERPT_LENGTH = 120
+
+
+def _latest_questions():
+    questions = (
+        PublicQuestion.objects.filter(is_answered=True)
+        .values('title', 'body', 'answer_text', 'answered_by__user__username')[:LATEST_QUESTIONS]
+    )
+    return [
+        {
+            'title': q['title'],
+            'excerpt': Truncator(q['answer_text'] or q['body']).chars(EXCERPT_LENGTH),
+            'answered_by': q['answered_by__user__username'] or '',
+        }
+        for q in questions
+    ]
+
+
+def _top_lawyers():
+    lawyers = (
+        LawyerDirectoryEntry.objects.order_by('-years_experience', '-lawyer_id')
+        .values('display_name', 'specialty__name', 'years_experience')[:TOP_LAWYERS]
+    )
+    return [
+        {'display_name': e['display_name'], 'specialty': e['specialty__name'], 'years_experience': e['years_experience']}
+        for e in lawyers
+    ]
+
+
+def rebuild(questions=True, lawyers=True):
+    """
+    Recomputes the summary row and returns it, stamping the questions and/or
+    lawyers side as changed.
+    """
+    now = timezone.now()
+    defaults = {
+        'latest_questions': _latest_questions(),
+        'lawyers': _top_lawyers(),
+        'answered_count': PublicQuestion.objects.filter(is_answered=True).count(),
+        'lawyer_count': LawyerDirectoryEntry.objects.count(),
+    }
+    if questions:
+        defaults['questions_changed_at'] = now
+    if lawyers:
+        defaults['lawyers_changed_at'] = now
+    summary, _ = HomeSummary.objects.update_or_create(pk=SUMMARY_PK, defaults=defaults)
+    return summary
+
+
+def refresh():
+    """rebuild(), then drop the page cache so the public pages pick it up."""
+    rebuild()
+    pagecache.invalidate()
+
+
+def _counter(field, delta):
+    # Clamped so a drifted counter cannot trip the PositiveIntegerField check.
+    return Greatest(F(field) + delta, Value(0)) if delta else F(field)
+
+
+def update(questions=False, lawyers=False, answered_delta=0, lawyer_delta=0):
+    """
+    Applies a change without recounting: recomputes the latest-questions
+    and/or top-lawyers list, moves answered_count and lawyer_count by the
+    given deltas and drops the page cache.
+    """
+    now = timezone.now()
+    fields = {}
+    if questions:
+        fields.update(latest_questions=_latest_questions(), questions_changed_at=now)
+    if lawyers:
+        fields.update(lawyers=_top_lawyers(), lawyers_changed_at=now)
+    if answered_delta:
+        fields['answered_count'] = _counter('answered_count', answered_delta)
+    if lawyer_delta:
+        fields['lawyer_count'] = _counter('lawyer_count', lawyer_delta)
+    if fields and not HomeSummary.objects.filter(pk=SUMMARY_PK).update(**fields):
+        # No row yet (straight after migrate or a flush): count from scratch.
+        rebuild(questions, lawyers)
+    pagecache.invalidate()
+
+
+def refresh_questions(answered_delta=0):
+    """After an answered question changed; ``answered_delta`` is the change in how many are answered."""
+    update(questions=True, answered_delta=answered_delta)
+
+
+def refresh_lawyers(lawyer_delta=0):
+    """After the directory changed; ``lawyer_delta`` is the change in how many lawyers it lists."""
+    update(lawyers=True, lawyer_delta=lawyer_delta)
+
+
+def load():
+    """The summary row, built on first use (e.g. straight after migrate or a flush)."""
+    return HomeSummary.objects.filter(pk=SUMMARY_PK).first() or rebuild()
+
+
+async def aload():
+    return await HomeSummary.objects.filter(pk=SUMMARY_PK).afirst() or await sync_to_async(rebuild)()
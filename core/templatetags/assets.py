@@ -0,0 +1,38 @@
+"""
+Template tags for the static asset pipeline (core.staticfiles).
+
+{% inline_static 'core/css/critical.css' %} inlines a static file, so the
+page shell can be styled without a render-blocking request.
+"""
+from functools import lru_cache
+
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.utils.safestring import mark_safe
+
+from ..staticfiles import minify_css
+
+register = template.Library()
+
+
+def _read(path):
+    if settings.DEBUG or not hasattr(staticfiles_storage, 'stored_name'):
+        # Not collected yet, or stored without a manifest (as under test):
+        # read (and minify) the source file.
+        with open(finders.find(path), encoding='utf-8') as fh:
+            content = fh.read()
+        return minify_css(content) if path.endswith('.css') else content
+    with staticfiles_storage.open(staticfiles_storage.stored_name(path)) as fh:
+        return fh.read().decode('utf-8')
+
+
+_read_collected = lru_cache(maxsize=None)(_read)
+
+
+@register.simple_tag
+def inline_static(path):
+    """The contents of static file ``path``, read once per process outside DEBUG."""
+    return mark_safe((_read if settings.DEBUG else _read_collected)(path))
+
@@ -0,0 +1,953 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, Storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections, transaction
+from django.http import HttpResponse, QueryDict
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core import answering, bulk, directory, duplicates, metrics, pagecache, ratelimit, replicas, summary
+from core.mail import _claim, queue_email, send_queued_email
+from core.directory import DirectoryQuery
+from core.management.commands import purge_verification_tokens as purge
+from core.management.commands.check_query_plans import hot_queries
+from core.middleware import ReplicaPinningMiddleware
+from core.models import (
+    CustomerProfile, LawyerDirectoryEntry, LawyerProfile, OutboundEmail, PublicQuestion, QuestionBucket,
+    QuestionSignature, ReplicaHeartbeat, Specialty, VerificationToken,
+)
+from core.search import search_questions
+from core.staticfiles import minify_css
+from core.storage import sendfile_response
+from core.views import PUBLIC_QUESTIONS_PAGE_SIZE, _public_questions_queryset
+
+
+# The test runner turns DEBUG off and nothing has been collected, so pages
+# are rendered with plain (unhashed) static storage.
+@override_settings(STORAGES={
+    **settings.STORAGES, 'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class PageTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        logging.getLogger('core.requests').setLevel(logging.WARNING)
+
+
+def make_lawyer(username='lawyer', specialty='Family law', approved=True):
+    user = User.objects.create(username=username, email=f'{username}@example.com')
+    return LawyerProfile.objects.create(user=user, specialty=specialty, years_experience=5,
+                                        bar_number=f'B-{username}', approved=approved)
+
+
+class PlanAssertions:
+    def assertSeeks(self, queryset, index, column):
+        """The plan must start ``queryset`` at its cursor: a range bound on ``column`` in ``index``."""
+        if connection.vendor == 'postgresql':
+            # Empty test tables make sequential scans look cheapest.
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        plan = queryset.explain()
+        self.assertIn(index, plan)
+        if connection.vendor == 'sqlite':
+            self.assertRegex(plan, rf'SEARCH \S+ USING (COVERING )?INDEX {index} \([^)]*\b{column}[<>]')
+        elif connection.vendor == 'postgresql':
+            self.assertRegex(plan, rf'Index Cond: .*{column} [<>]=')
+
+
+class QueryPlanTests(TestCase):
+    """The hot public queries must keep using their indexes (see check_query_plans)."""
+
+    def test_hot_queries_use_their_index(self):
+        if connection.vendor == 'postgresql':
+            # Empty test tables make sequential scans look cheapest.
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        for label, queryset, index in hot_queries():
+            with self.subTest(label):
+                self.assertIn(index, queryset.explain())
+
+
+class PublicQuestionFeedTests(PlanAssertions, PageTestCase):
+    def setUp(self):
+        cache.clear()
+        self.lawyer = make_lawyer()
+
+    def _answered(self, count, created_at=None):
+        questions = [
+            PublicQuestion.objects.create(title=f'Question {i}', body='Body', is_answered=True,
+                                          answer_text='Answer', answered_by=self.lawyer)
+            for i in range(count)
+        ]
+        if created_at is not None:
+            PublicQuestion.objects.filter(pk__in=[q.pk for q in questions]).update(created_at=created_at)
+        return questions
+
+    def _walk(self):
+        """Follows the ``before`` cursors from the first page; returns every question id seen."""
+        seen, params = [], {}
+        while True:
+            response = self.client.get(reverse('public_questions'), params)
+            seen += [q.pk for q in response.context['questions']]
+            if not response.context['next_cursor']:
+                return seen
+            params = {'before': response.context['next_cursor']}
+
+    def test_pages_cover_every_answered_question_once_newest_first(self):
+        now = timezone.now()
+        older = self._answered(PUBLIC_QUESTIONS_PAGE_SIZE, created_at=now - timedelta(days=1))
+        # Ties on created_at across a page boundary are broken by id.
+        newer = self._answered(PUBLIC_QUESTIONS_PAGE_SIZE + 5, created_at=now)
+        PublicQuestion.objects.create(title='Unanswered', body='Body')
+
+        expected = sorted((q.pk for q in newer), reverse=True) + sorted((q.pk for q in older), reverse=True)
+        self.assertEqual(self._walk(), expected)
+
+    def test_malformed_cursor_starts_from_the_top(self):
+        self._answered(3)
+        response = self.client.get(reverse('public_questions'), {'before': 'not-a-cursor'})
+        self.assertTrue(response.context['is_first_page'])
+        self.assertEqual(len(response.context['questions']), 3)
+
+    def test_oversized_cursor_id_starts_from_the_top(self):
+        self._answered(3)
+        before = f'{timezone.now().isoformat()}_{2 ** 70}'
+        response = self.client.get(reverse('public_questions'), {'before': before})
+        self.assertTrue(response.context['is_first_page'])
+        response = self.client.get(reverse('api_questions'), {'before': before})
+        self.assertEqual(len(response.json()['results']), 3)
+
+    def test_cursor_page_seeks_the_index(self):
+        cursor = (timezone.now(), 5)
+        self.assertSeeks(_public_questions_queryset(False, cursor), 'core_pq_answered_created_idx', 'created_at')
+        self.assertSeeks(_public_questions_queryset(True, cursor), 'core_pq_created_idx', 'created_at')
+
+    def _page_queries(self):
+        summary.rebuild()
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('public_questions'))
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_the_archive(self):
+        self._answered(2)
+        small = self._page_queries()
+        self._answered(PUBLIC_QUESTIONS_PAGE_SIZE * 3)
+        self.assertEqual(self._page_queries(), small)
+
+
+class AnsweringTests(TestCase):
+    def setUp(self):
+        self.alice = make_lawyer('alice')
+        self.bob = make_lawyer('bob')
+        self.question = PublicQuestion.objects.create(title='Question', body='Body')
+
+    def test_claim_reserves_the_question(self):
+        self.assertEqual(answering.claim(self.question.pk, self.alice), answering.CLAIMED)
+        self.assertEqual(answering.claim(self.question.pk, self.bob), answering.TAKEN)
+        # Reopening the form renews the holder's own claim.
+        self.assertEqual(answering.claim(self.question.pk, self.alice), answering.CLAIMED)
+
+    def test_only_the_claim_holder_can_answer(self):
+        answering.claim(self.question.pk, self.alice)
+        self.assertFalse(answering.submit_answer(self.question.pk, self.bob, 'Bob'))
+        self.assertTrue(answering.submit_answer(self.question.pk, self.alice, 'Alice'))
+
+        self.question.refresh_from_db()
+        self.assertEqual((self.question.answer_text, self.question.answered_by), ('Alice', self.alice))
+        self.assertIsNone(self.question.claimed_by)
+
+    def test_first_submission_wins(self):
+        # Neither lawyer claimed: whoever submits first answers, the other is refused.
+        self.assertTrue(answering.submit_answer(self.question.pk, self.bob, 'Bob'))
+        self.assertFalse(answering.submit_answer(self.question.pk, self.alice, 'Alice'))
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.answer_text, 'Bob')
+        self.assertEqual(answering.claim(self.question.pk, self.alice), answering.ANSWERED)
+
+    def test_lapsed_claim_can_be_taken_over(self):
+        answering.claim(self.question.pk, self.alice)
+        PublicQuestion.objects.filter(pk=self.question.pk).update(claim_expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(answering.claim(self.question.pk, self.bob), answering.CLAIMED)
+        self.assertFalse(answering.submit_answer(self.question.pk, self.alice, 'Alice'))
+
+    def test_release_frees_the_question(self):
+        answering.claim(self.question.pk, self.alice)
+        answering.release(self.question.pk, self.bob)  # not Bob's to release
+        self.assertEqual(answering.claim(self.question.pk, self.bob), answering.TAKEN)
+        answering.release(self.question.pk, self.alice)
+        self.assertEqual(answering.claim(self.question.pk, self.bob), answering.CLAIMED)
+
+    def test_missing_question(self):
+        self.assertEqual(answering.claim(self.question.pk + 1, self.alice), answering.MISSING)
+        self.assertFalse(answering.submit_answer(self.question.pk + 1, self.alice, 'Alice'))
+
+
+class QuestionQueueTests(PlanAssertions, TestCase):
+    def setUp(self):
+        self.family = Specialty.for_name('Family law')
+        self.alice = make_lawyer('alice')
+        self.bob = make_lawyer('bob')
+        now = timezone.now()
+        self.queue = []
+        for minutes in (30, 20, 10):
+            question = PublicQuestion.objects.create(title='Family', body='Body', specialty=self.family)
+            PublicQuestion.objects.filter(pk=question.pk).update(created_at=now - timedelta(minutes=minutes))
+            self.queue.append(question.pk)
+        PublicQuestion.objects.create(title='General', body='Body')
+        PublicQuestion.objects.create(title='Answered', body='Body', specialty=self.family, is_answered=True)
+
+    def test_pending_is_oldest_first_within_the_specialty(self):
+        self.assertEqual([q.pk for q in answering.pending(self.family)], self.queue)
+        first = PublicQuestion.objects.get(pk=self.queue[0])
+        after = [q.pk for q in answering.pending(self.family, (first.created_at, first.pk))]
+        self.assertEqual(after, self.queue[1:])
+
+    def test_deep_page_seeks_the_index(self):
+        first = PublicQuestion.objects.get(pk=self.queue[1])
+        for specialty in (self.family, None):
+            with self.subTest(specialty=specialty):
+                self.assertSeeks(answering.pending(specialty, (first.created_at, first.pk)),
+                                 'core_pq_queue_idx', 'created_at')
+
+    def _in_both_modes(self, check):
+        """Runs ``check`` down the SKIP LOCKED path and the compare-and-swap path."""
+        for skip_locked in (True, False):
+            with self.subTest(skip_locked=skip_locked), \
+                    mock.patch.object(connection.features, 'has_select_for_update_skip_locked', skip_locked), \
+                    transaction.atomic():
+                check()
+                transaction.set_rollback(True)
+
+    def test_claim_next_hands_out_each_question_once(self):
+        def check():
+            claimed = [answering.claim_next(lawyer, self.family).pk for lawyer in (self.alice, self.bob, self.alice)]
+            # Alice's second call gets back the question she already holds.
+            self.assertEqual(claimed, [self.queue[0], self.queue[1], self.queue[0]])
+            self.assertEqual(PublicQuestion.objects.get(pk=self.queue[1]).claimed_by, self.bob)
+        self._in_both_modes(check)
+
+    def test_claim_next_skips_claims_held_by_others_and_drains(self):
+        def check():
+            answering.claim(self.queue[0], self.bob)
+            self.assertEqual(answering.claim_next(self.alice, self.family).pk, self.queue[1])
+            answering.submit_answer(self.queue[1], self.alice, 'Answer')
+            self.assertEqual(answering.claim_next(self.alice, self.family).pk, self.queue[2])
+            answering.submit_answer(self.queue[2], self.alice, 'Answer')
+            self.assertIsNone(answering.claim_next(self.alice, self.family))
+        self._in_both_modes(check)
+
+
+@skipUnless(connection.features.has_select_for_update_skip_locked, "needs SELECT ... FOR UPDATE SKIP LOCKED")
+class QuestionQueueLockingTests(TransactionTestCase):
+    def test_claim_next_skips_a_row_another_transaction_has_locked(self):
+        family = Specialty.for_name('Family law')
+        alice, bob = make_lawyer('alice'), make_lawyer('bob')
+        first = PublicQuestion.objects.create(title='First', body='Body', specialty=family)
+        second = PublicQuestion.objects.create(title='Second', body='Body', specialty=family)
+        locked, release = threading.Event(), threading.Event()
+
+        def hold_lock():
+            try:
+                with transaction.atomic():
+                    PublicQuestion.objects.select_for_update().get(pk=first.pk)
+                    locked.set()
+                    release.wait(10)
+            finally:
+                connections.close_all()
+
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        try:
+            self.assertTrue(locked.wait(10))
+            self.assertEqual(answering.claim_next(alice, family).pk, second.pk)
+        finally:
+            release.set()
+            holder.join()
+        self.assertEqual(answering.claim_next(bob, family).pk, first.pk)
+
+
+@override_settings(RATELIMIT_ENABLED=True, RATE_LIMITS={'login': (2, 60)},
+                   PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class RateLimitTests(PageTestCase):
+    def setUp(self):
+        cache.clear()
+        ratelimit._local.clear()
+        self.now = 1_000_000.0
+        clock = mock.patch('core.ratelimit.time.time', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def _login(self, username='someone', ip='10.0.0.1'):
+        return self.client.post(reverse('login'), {'username': username, 'password': 'wrong'}, REMOTE_ADDR=ip)
+
+    def test_burst_then_429_with_retry_after(self):
+        self.assertEqual(self._login().status_code, 200)
+        self.assertEqual(self._login().status_code, 200)
+        response = self._login()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+
+    def test_buckets_are_per_ip_and_per_username(self):
+        self._login('alice', '10.0.0.1')
+        self._login('alice', '10.0.0.1')
+        # Same address, other account: the IP bucket is empty.
+        self.assertEqual(self._login('bob', '10.0.0.1').status_code, 429)
+        # Other address, same account: the username bucket is empty.
+        self.assertEqual(self._login('Alice', '10.0.0.2').status_code, 429)
+        self.assertEqual(self._login('carol', '10.0.0.3').status_code, 200)
+
+    def test_tokens_refill_over_time(self):
+        self._login()
+        self._login()
+        self.now += 1
+        self.assertEqual(self._login().status_code, 200)
+        self.assertEqual(self._login().status_code, 429)
+
+    def test_get_is_not_throttled(self):
+        for _ in range(5):
+            self._login()
+        self.assertEqual(self.client.get(reverse('login'), REMOTE_ADDR='10.0.0.1').status_code, 200)
+
+    def test_unreachable_cache_falls_back_to_local_buckets(self):
+        broken = mock.Mock(**{'get.side_effect': ConnectionError, 'set.side_effect': ConnectionError})
+        with mock.patch('core.ratelimit.caches', {settings.RATELIMIT_CACHE_ALIAS: broken}), \
+                self.assertLogs('core.ratelimit', 'WARNING'):
+            self._login()
+            self._login()
+            self.assertEqual(self._login().status_code, 429)
+
+
+class LawyerSettingsTests(PageTestCase):
+    def setUp(self):
+        self.lawyer = make_lawyer()
+        self.client.force_login(self.lawyer.user)
+
+    def _post(self, **data):
+        return self.client.post(reverse('settings_lawyer'), {
+            'username': 'renamed', 'email': 'renamed@example.com', 'specialty': 'Tax law',
+            'years_experience': 7, **data,
+        })
+
+    @override_settings(MAX_UPLOAD_BYTES=1)
+    def test_rejected_certificate_changes_nothing(self):
+        self._post(bar_certificate=SimpleUploadedFile('bar.pdf', b'too large'))
+        self.lawyer.refresh_from_db()
+        self.lawyer.user.refresh_from_db()
+        self.assertEqual((self.lawyer.user.username, self.lawyer.specialty), ('lawyer', 'Family law'))
+
+    def test_saves_account_and_profile(self):
+        self.assertRedirects(self._post(new_password='n3w-passw0rd'), reverse('login'),
+                             fetch_redirect_response=False)
+        self.lawyer.refresh_from_db()
+        self.lawyer.user.refresh_from_db()
+        self.assertEqual((self.lawyer.user.username, self.lawyer.specialty, self.lawyer.years_experience),
+                         ('renamed', 'Tax law', 7))
+        self.assertTrue(self.lawyer.user.check_password('n3w-passw0rd'))
+
+
+class DuplicateTests(PageTestCase):
+    CUSTODY = ('Child custody after divorce',
+               'My former husband wants full custody of our two children after the divorce. '
+               'Can he move them to another city without my written agreement?')
+    REWORDED = ('Child custody after a divorce',
+                'My former husband wants full custody of our two children after the divorce. '
+                'Can he move them to another town without my written agreement?')
+    UNRELATED = ('Landlord kept my deposit', 'The landlord refuses to return the security deposit on my flat.')
+
+    def _answered(self, title, body):
+        with self.captureOnCommitCallbacks(execute=True):
+            return PublicQuestion.objects.create(title=title, body=body, is_answered=True, answer_text='Answer')
+
+    def _found(self, title, body):
+        return [question.pk for _, question in duplicates.similar_questions(title, body)]
+
+    def test_signature_and_bands(self):
+        sig = duplicates.signature(*self.CUSTODY)
+        self.assertEqual(len(sig), duplicates.NUM_PERM)
+        self.assertEqual(duplicates.BANDS * duplicates.ROWS, duplicates.NUM_PERM)
+        self.assertEqual(len(set(duplicates.bucket_keys(sig))), duplicates.BANDS)
+        self.assertEqual(duplicates.similarity(sig, duplicates.signature(*self.CUSTODY)), 1.0)
+        self.assertLess(duplicates.similarity(sig, duplicates.signature(*self.UNRELATED)),
+                        duplicates.SIMILARITY_THRESHOLD)
+        self.assertIsNone(duplicates.signature('a b', 'the'))
+
+    def test_near_duplicates_are_found_and_unrelated_are_not(self):
+        custody = self._answered(*self.CUSTODY)
+        self._answered(*self.UNRELATED)
+        found = duplicates.similar_questions(*self.REWORDED)
+        self.assertEqual([question.pk for _, question in found], [custody.pk])
+        self.assertGreaterEqual(found[0][0], duplicates.SIMILARITY_THRESHOLD)
+        self.assertEqual(self._found('Parking fine', 'A parking ticket for a car I had already sold.'), [])
+        with mock.patch.object(duplicates, 'SIMILARITY_THRESHOLD', 1.01):
+            self.assertEqual(self._found(*self.REWORDED), [])
+
+    def test_unanswered_questions_are_not_indexed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            PublicQuestion.objects.create(title=self.CUSTODY[0], body=self.CUSTODY[1])
+        self.assertEqual(self._found(*self.REWORDED), [])
+
+    def test_buckets_follow_edits_and_deletes(self):
+        question = self._answered(*self.CUSTODY)
+        question.title, question.body = self.UNRELATED
+        with self.captureOnCommitCallbacks(execute=True):
+            question.save()
+        self.assertEqual(self._found(*self.REWORDED), [])
+        self.assertEqual(self._found(*self.UNRELATED), [question.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            question.delete()
+        self.assertEqual(self._found(*self.UNRELATED), [])
+        self.assertFalse(QuestionBucket.objects.exists())
+
+    def test_rebuild_recreates_the_index(self):
+        question = self._answered(*self.CUSTODY)
+        QuestionBucket.objects.all().delete()
+        QuestionSignature.objects.all().delete()
+        call_command('rebuild_duplicate_index', '--missing', stdout=StringIO())
+        self.assertEqual(self._found(*self.REWORDED), [question.pk])
+        call_command('rebuild_duplicate_index', stdout=StringIO())
+        self.assertEqual(self._found(*self.REWORDED), [question.pk])
+        self.assertEqual(QuestionBucket.objects.count(), duplicates.BANDS)
+
+    def test_ask_offers_duplicates_then_posts_anyway(self):
+        self._answered(*self.CUSTODY)
+        customer = User.objects.create(username='customer')
+        CustomerProfile.objects.create(user=customer)
+        self.client.force_login(customer)
+        data = {'title': self.REWORDED[0], 'body': self.REWORDED[1]}
+
+        response = self.client.post(reverse('ask_public_question'), data)
+        self.assertEqual(len(response.context['similar']), 1)
+        self.assertContains(response, 'name="post_anyway"')
+        self.assertFalse(PublicQuestion.objects.filter(is_answered=False).exists())
+
+        response = self.client.post(reverse('ask_public_question'), {**data, 'post_anyway': '1'})
+        self.assertRedirects(response, reverse('public_questions'), fetch_redirect_response=False)
+        self.assertTrue(PublicQuestion.objects.filter(is_answered=False, name='customer').exists())
+
+
+class SearchTests(TestCase):
+    def test_french_matches_inflected_words(self):
+        question = PublicQuestion.objects.create(title='Contrats de location', body='Bail meublé', is_answered=True)
+        PublicQuestion.objects.create(title='Garde des enfants', body='Divorce', is_answered=True)
+        self.assertEqual(search_questions('contrat location', lang='fr'), [question])
+
+
+class DirectoryPagingTests(PlanAssertions, PageTestCase):
+    def test_cursor_page_seeks_the_index(self):
+        for query, index, column in [
+            ('after=bob_5', 'core_dir_name_idx', 'display_name'),
+            ('sort=-experience&after=10_5', 'core_dir_years_idx', 'years_experience'),
+            ('sort=experience&after=10_5', 'core_dir_years_idx', 'years_experience'),
+        ]:
+            with self.subTest(query):
+                self.assertSeeks(DirectoryQuery(QueryDict(query)).entries(), index, column)
+
+    def test_out_of_range_cursor_starts_from_the_top(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_lawyer()
+        for query in (f'after=bob_{2 ** 70}', f'sort=experience&after={2 ** 40}_1', 'sort=experience&after=x_1'):
+            with self.subTest(query):
+                self.assertIsNone(DirectoryQuery(QueryDict(query)).cursor)
+                response = self.client.get(f"{reverse('api_lawyers')}?{query}")
+                self.assertEqual(len(response.json()['results']), 1)
+
+
+class DirectoryFacetTests(PageTestCase):
+    def _bands(self, slug='family-law'):
+        return Specialty.objects.get(slug=slug).band_counts
+
+    def test_band_counts_follow_profile_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            lawyer = make_lawyer()
+            senior = make_lawyer('senior', specialty='Tax law')
+        LawyerProfile.objects.filter(pk=senior.pk).update(years_experience=25)
+        directory.rebuild()
+        self.assertEqual(self._bands(), {'0-4': 0, '5-9': 1, '10-19': 0, '20+': 0})
+        self.assertEqual(self._bands('tax-law')['20+'], 1)
+
+        lawyer.years_experience = 12
+        with self.captureOnCommitCallbacks(execute=True):
+            lawyer.save()
+        self.assertEqual(self._bands(), {'0-4': 0, '5-9': 0, '10-19': 1, '20+': 0})
+
+        directory.set_approved(LawyerProfile.objects.all(), False)
+        self.assertEqual(sum(self._bands().values()), 0)
+        self.assertEqual(Specialty.objects.get(slug='family-law').lawyer_count, 0)
+        directory.set_approved(LawyerProfile.objects.all(), True)
+        self.assertEqual(self._bands()['10-19'], 1)
+
+    def test_page_reads_the_precomputed_facets(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_lawyer()
+            make_lawyer('other', specialty='Tax law')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('lawyers_list'), {'specialty': 'tax-law'})
+        self.assertEqual(dict((key, n) for key, _, n in response.context['experience_bands'])['5-9'], 1)
+        self.assertFalse([q['sql'] for q in queries if 'COUNT(' in q['sql'].upper()])
+
+
+class PurgeVerificationTokensTests(TestCase):
+    def _abandon(self, username, lawyer=False):
+        if lawyer:
+            user = make_lawyer(username, approved=False).user
+        else:
+            user = User.objects.create(username=username)
+            CustomerProfile.objects.create(user=user)
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        token = VerificationToken.objects.create(user=user, token=username)
+        VerificationToken.objects.filter(pk=token.pk).update(created_at=timezone.now() - timedelta(days=30))
+        return user
+
+    def test_purges_abandoned_accounts_and_keeps_the_rest(self):
+        self._abandon('customer')
+        self._abandon('lawyer', lawyer=True)
+        kept = User.objects.create(username='verified')
+        fresh = User.objects.create(username='fresh', is_active=False)
+        VerificationToken.objects.create(user=fresh, token='fresh')
+        call_command('purge_verification_tokens', batch_size=1, stdout=StringIO())
+        self.assertQuerySetEqual(User.objects.order_by('username'), [fresh, kept])
+        self.assertFalse(CustomerProfile.objects.exists())
+        self.assertFalse(LawyerProfile.objects.exists())
+
+    def test_account_tables_cover_every_user_relation(self):
+        related = {rel.related_model for rel in User._meta.related_objects} | {
+            field.remote_field.through for field in User._meta.many_to_many
+        }
+        self.assertEqual(related - set(purge.ACCOUNT_TABLES), {LawyerProfile})
+        for model in purge.ACCOUNT_TABLES:
+            self.assertFalse(model._meta.related_objects, model)
+
+
+@override_settings(DATABASE_ROUTERS=['core.replicas.ReplicaRouter'])
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    replica1 is a second connection to the test database (TEST['MIRROR'],
+    see settings.py). Only committed rows are visible through it, so this is
+    a TransactionTestCase; the queries logged per alias show the routing.
+    """
+    databases = {'default', 'replica1'}
+
+    def setUp(self):
+        replicas._health.clear()
+        self.factory = RequestFactory()
+        self.middleware = ReplicaPinningMiddleware(replicas.replica_reads(self._view))
+        self.write = False
+
+    def _view(self, request):
+        if self.write:
+            PublicQuestion.objects.create(title='Question', body='Body')
+        return HttpResponse(PublicQuestion.objects.count())
+
+    def _request(self, **cookies):
+        """Runs a request through the middleware; returns (response, aliases that served reads)."""
+        request = self.factory.get('/')
+        request.COOKIES.update(cookies)
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica1']) as replica:
+            response = self.middleware(request)
+        counted = {'default': primary, 'replica1': replica}
+        return response, {alias for alias, queries in counted.items()
+                          if any('COUNT(' in q['sql'] for q in queries)}
+
+    def test_reads_go_to_a_current_replica(self):
+        replicas.beat()
+        response, readers = self._request()
+        self.assertEqual(readers, {'replica1'})
+        self.assertNotIn(replicas.PIN_COOKIE, response.cookies)
+
+    def test_a_write_pins_the_client_to_the_primary(self):
+        replicas.beat()
+        self.write = True
+        response, readers = self._request()
+        # The read after the write in the same request already stays on the primary.
+        self.assertEqual(readers, {'default'})
+        self.assertIn(replicas.PIN_COOKIE, response.cookies)
+
+        self.write = False
+        _, readers = self._request(**{replicas.PIN_COOKIE: '1'})
+        self.assertEqual(readers, {'default'})
+
+    def test_a_lagging_or_silent_replica_is_skipped(self):
+        with self.assertLogs('core.replicas', 'WARNING') as logs:
+            _, readers = self._request()
+        self.assertEqual(readers, {'default'})
+        self.assertIn('missing its heartbeat', logs.output[0])
+
+        replicas._health.clear()
+        ReplicaHeartbeat.objects.create(
+            pk=replicas.HEARTBEAT_PK,
+            beat_at=timezone.now() - timedelta(seconds=settings.REPLICA_MAX_LAG_SECONDS + 1),
+        )
+        with self.assertLogs('core.replicas', 'WARNING') as logs:
+            _, readers = self._request()
+        self.assertEqual(readers, {'default'})
+        self.assertIn('behind', logs.output[0])
+
+    def test_writes_outside_replica_reads_use_the_primary(self):
+        replicas.beat()
+        with CaptureQueriesContext(connections['replica1']) as replica:
+            PublicQuestion.objects.create(title='Question', body='Body')
+            PublicQuestion.objects.count()
+        self.assertFalse(replica.captured_queries)
+
+
+class RemoteStorage(Storage):
+    """Like S3 and other remote backends: no local path (Storage.path raises)."""
+    def __init__(self):
+        self.files = {}
+
+    def _save(self, name, content):
+        self.files[name] = content.read()
+        return name
+
+    def _open(self, name, mode='rb'):
+        return ContentFile(self.files[name], name=name)
+
+    def exists(self, name):
+        return name in self.files
+
+
+class SendfileTests(TestCase):
+    def _serve(self, storage):
+        name = storage.save('certificate.pdf', ContentFile(b'%PDF'))
+        return sendfile_response(storage, name)
+
+    @override_settings(SENDFILE_MODE='x-sendfile')
+    def test_x_sendfile_hands_local_files_to_the_server(self):
+        with tempfile.TemporaryDirectory() as root:
+            response = self._serve(FileSystemStorage(location=root))
+            self.assertTrue(response['X-Sendfile'].startswith(root))
+            self.assertEqual(response.content, b'')
+
+    @override_settings(SENDFILE_MODE='x-sendfile')
+    def test_x_sendfile_streams_files_without_a_local_path(self):
+        response = self._serve(RemoteStorage())
+        self.assertNotIn('X-Sendfile', response)
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF')
+
+
+class AdminActionTests(PageTestCase):
+    def setUp(self):
+        admin_user = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+        self.client.force_login(admin_user)
+        summary.rebuild()
+
+    def _act(self, model, action, objects):
+        url = reverse(f'admin:core_{model}_changelist')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'action': action, '_selected_action': [o.pk for o in objects]})
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+
+    def test_approve_and_unapprove_update_the_directory_and_summary(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            lawyers = [make_lawyer(f'lawyer{i}', approved=False) for i in range(3)]
+        family = Specialty.for_name('Family law')
+
+        self._act('lawyerprofile', 'approve_lawyers', lawyers[:2])
+        family.refresh_from_db()
+        self.assertEqual(LawyerDirectoryEntry.objects.count(), 2)
+        self.assertEqual((family.lawyer_count, family.band_counts['5-9']), (2, 2))
+        self.assertEqual(summary.load().lawyer_count, 2)
+
+        # Already approved lawyers do not count twice.
+        self._act('lawyerprofile', 'approve_lawyers', lawyers)
+        self.assertEqual(summary.load().lawyer_count, 3)
+
+        self._act('lawyerprofile', 'unapprove_lawyers', lawyers[:1])
+        family.refresh_from_db()
+        self.assertFalse(LawyerDirectoryEntry.objects.filter(lawyer=lawyers[0]).exists())
+        self.assertEqual((family.lawyer_count, family.band_counts['5-9']), (2, 2))
+        self.assertEqual(summary.load().lawyer_count, 2)
+
+    def test_token_purges(self):
+        user = User.objects.create(username='customer')
+        expired, fresh = [VerificationToken.objects.create(user=user, token=token) for token in ('old', 'new')]
+        VerificationToken.objects.filter(pk=expired.pk).update(created_at=timezone.now() - timedelta(days=30))
+
+        self._act('verificationtoken', 'purge_expired_tokens', [expired, fresh])
+        self.assertQuerySetEqual(VerificationToken.objects.all(), [fresh])
+        self._act('verificationtoken', 'purge_tokens', [fresh])
+        self.assertFalse(VerificationToken.objects.exists())
+
+
+class RecordingEmailBackend(BaseEmailBackend):
+    """Records what it sends and whether a database transaction was open at the time."""
+    sent = []
+    fail = False
+
+    def send_messages(self, messages):
+        if self.fail:
+            raise ConnectionError("mail server down")
+        for message in messages:
+            RecordingEmailBackend.sent.append((message.subject, connection.in_atomic_block))
+        return len(messages)
+
+
+@override_settings(EMAIL_BACKEND='core.tests.RecordingEmailBackend', EMAIL_QUEUE_MAX_ATTEMPTS=2)
+class MailQueueTests(TransactionTestCase):
+    def setUp(self):
+        RecordingEmailBackend.sent = []
+        RecordingEmailBackend.fail = False
+
+    def test_sends_outside_any_transaction(self):
+        for i in range(3):
+            queue_email(f'Subject {i}', 'Body', ['to@example.com'])
+        self.assertEqual(send_queued_email(), (3, 0))
+        self.assertEqual(RecordingEmailBackend.sent, [(f'Subject {i}', False) for i in range(3)])
+        self.assertFalse(OutboundEmail.objects.exclude(status=OutboundEmail.SENT).exists())
+        self.assertEqual(send_queued_email(), (0, 0))
+
+    def test_failures_back_off_then_give_up(self):
+        email = queue_email('Subject', 'Body', ['to@example.com'])
+        RecordingEmailBackend.fail = True
+        self.assertEqual(send_queued_email(), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboundEmail.PENDING, 1))
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertIn('mail server down', email.last_error)
+        # Not due yet.
+        self.assertEqual(send_queued_email(), (0, 0))
+
+        OutboundEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(send_queued_email(), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboundEmail.FAILED, 2))
+
+    def test_leased_rows_are_not_claimed_twice(self):
+        queue_email('Subject', 'Body', ['to@example.com'])
+        self.assertEqual(len(_claim(10)), 1)
+        self.assertEqual(_claim(10), [])
+        self.assertEqual(send_queued_email(), (0, 0))
+
+
+class ImportTests(TestCase):
+    def test_questions_keep_their_archived_created_at(self):
+        created = bulk.QuestionDataset().import_batch([
+            {'title': 'Old', 'body': 'Body', 'created_at': '2020-01-02T03:04:05+00:00'},
+            {'title': 'New', 'body': 'Body'},
+        ])
+        self.assertEqual(created, 2)
+        old, new = PublicQuestion.objects.order_by('created_at')
+        self.assertEqual(old.created_at.isoformat(), '2020-01-02T03:04:05+00:00')
+        self.assertLess(timezone.now() - new.created_at, timedelta(minutes=1))
+        self.assertTrue(PublicQuestion._meta.get_field('created_at').auto_now_add)
+
+
+class HomeSummaryTests(TestCase):
+    def setUp(self):
+        summary.rebuild()
+
+    def _counts(self):
+        home = summary.load()
+        return home.answered_count, home.lawyer_count
+
+    def test_answered_count_follows_question_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            lawyer = make_lawyer()
+            question = PublicQuestion.objects.create(title='Question', body='Body')
+        self.assertEqual(self._counts(), (0, 1))
+        with self.captureOnCommitCallbacks(execute=True):
+            answering.submit_answer(question.pk, lawyer, 'Answer')
+        self.assertEqual(self._counts(), (1, 1))
+        self.assertEqual(summary.load().latest_questions[0]['title'], 'Question')
+
+        question = PublicQuestion.objects.get(pk=question.pk)
+        question.is_answered = False
+        with self.captureOnCommitCallbacks(execute=True):
+            question.save()
+        self.assertEqual(self._counts(), (0, 1))
+        with self.captureOnCommitCallbacks(execute=True):
+            PublicQuestion.objects.create(title='Answered', body='Body', is_answered=True)
+            PublicQuestion.objects.get(pk=question.pk).delete()
+        self.assertEqual(self._counts(), (1, 1))
+
+    def test_lawyer_count_follows_the_directory(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            lawyer = make_lawyer(approved=False)
+        self.assertEqual(self._counts(), (0, 0))
+        lawyer.approved = True
+        with self.captureOnCommitCallbacks(execute=True):
+            lawyer.save()
+        self.assertEqual(self._counts(), (0, 1))
+        with self.captureOnCommitCallbacks(execute=True):
+            lawyer.delete()
+        self.assertEqual(self._counts(), (0, 0))
+
+    def test_refresh_does_not_recount(self):
+        with CaptureQueriesContext(connection) as queries:
+            summary.refresh_questions(1)
+            summary.refresh_lawyers(1)
+        self.assertFalse([q['sql'] for q in queries if 'COUNT(' in q['sql'].upper()])
+        self.assertEqual(self._counts(), (1, 1))
+
+
+class ConditionalGetTests(PageTestCase):
+    def setUp(self):
+        cache.clear()
+        self.lawyer = make_lawyer()
+        summary.rebuild()
+
+    def _answer(self, title):
+        # Signals only queue on_commit work here, so nothing invalidates the page cache.
+        return PublicQuestion.objects.create(title=title, body='Body', is_answered=True,
+                                             answer_text='Answer', answered_by=self.lawyer)
+
+    def test_unchanged_content_gets_304(self):
+        for name in ('public_questions', 'lawyers_list', 'api_questions', 'api_lawyers'):
+            with self.subTest(name):
+                response = self.client.get(reverse(name))
+                self.assertEqual(response.status_code, 200)
+                etag, last_modified = response['ETag'], response['Last-Modified']
+                self.assertEqual(self.client.get(reverse(name), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+                self.assertEqual(
+                    self.client.get(reverse(name), HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304
+                )
+
+    def test_changed_content_gets_200(self):
+        etag = self.client.get(reverse('api_questions'))['ETag']
+        self._answer('New')
+        summary.rebuild()
+        response = self.client.get(reverse('api_questions'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        response = self.client.get(reverse('api_questions'), HTTP_IF_MODIFIED_SINCE='Mon, 01 Jan 2001 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+
+    def test_missed_invalidation_is_not_served_under_new_validators(self):
+        self._answer('Old')
+        summary.rebuild()
+        self.assertContains(self.client.get(reverse('public_questions')), 'Old')
+        # As on a worker whose local page cache never saw the invalidation.
+        self._answer('New')
+        summary.rebuild()
+        self.assertContains(self.client.get(reverse('public_questions')), 'New')
+
+    @override_settings(ALLOWED_HOSTS=['a.example', 'b.example'])
+    def test_api_links_keep_the_requested_host(self):
+        for i in range(PUBLIC_QUESTIONS_PAGE_SIZE + 1):
+            self._answer(f'Question {i}')
+        summary.rebuild()
+        self.client.get(reverse('api_questions'), HTTP_HOST='a.example')
+        response = self.client.get(reverse('api_questions'), HTTP_HOST='b.example')
+        self.assertTrue(response.json()['next'].startswith('http://b.example/'))
+
+
+class StaticBuildTests(TestCase):
+    def test_minify_css(self):
+        css = """
+            /* dropped */ /*! kept */
+            .a :hover , .b > .c { width: calc(100% - 2px) ; content: "a  ;  b" ; }
+        """
+        self.assertEqual(
+            minify_css(css),
+            '/*! kept */ .a :hover,.b>.c{width:calc(100% - 2px);content:"a  ;  b"}',
+        )
+
+
+class PageCacheTests(PageTestCase):
+    def setUp(self):
+        cache.clear()
+        self.lawyer = make_lawyer()
+        summary.rebuild()
+
+    def _generation(self):
+        return pagecache._generation(pagecache._cache())
+
+    def _changes(self, change):
+        """Runs ``change`` and its on_commit work; asserts the page cache moved to a new generation."""
+        before = self._generation()
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        self.assertNotEqual(self._generation(), before)
+
+    def test_saves_drop_cached_pages(self):
+        question = PublicQuestion.objects.create(title='Custody question', body='Body')
+        self.assertNotContains(self.client.get(reverse('public_questions')), 'Custody question')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('public_questions'))
+        # Served from the page cache: the feed query did not run.
+        self.assertFalse([q for q in queries if 'FROM "core_publicquestion"' in q['sql']])
+
+        self._changes(lambda: answering.submit_answer(question.pk, self.lawyer, 'Answer'))
+        self.assertContains(self.client.get(reverse('public_questions')), 'Custody question')
+
+        question = PublicQuestion.objects.get(pk=question.pk)
+        question.answer_text = 'Revised answer'
+        self._changes(question.save)
+        self.assertContains(self.client.get(reverse('public_questions')), 'Revised answer')
+
+        self.assertNotContains(self.client.get(reverse('lawyers_list')), 'Tax law')
+        self.lawyer.specialty = 'Tax law'
+        self._changes(self.lawyer.save)
+        self.assertContains(self.client.get(reverse('lawyers_list')), 'Tax law')
+
+
+class LanguageTests(PageTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_switch_sets_the_cookie_without_a_session(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('about'), {'lang': 'fr'})
+        self.assertEqual(response['Content-Language'], 'fr')
+        self.assertIn(settings.LANGUAGE_COOKIE_NAME, response.cookies)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertFalse([q for q in queries if 'django_session' in q['sql']])
+        self.assertEqual(self.client.get(reverse('about'))['Content-Language'], 'fr')
+
+    def test_public_pages_are_private_to_the_browser(self):
+        response = self.client.get(reverse('home'))
+        self.assertIn('Cookie', response['Vary'])
+        self.assertIn('private', response['Cache-Control'])
+
+
+@override_settings(METRICS_TOKEN='s3cret')
+class MetricsTests(PageTestCase):
+    def _scrape(self, **headers):
+        return self.client.get(reverse('metrics'), **headers)
+
+    def test_requires_the_bearer_token(self):
+        self.assertEqual(self._scrape().status_code, 404)
+        self.assertEqual(self._scrape(HTTP_AUTHORIZATION='Bearer wrong').status_code, 404)
+        response = self._scrape(HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'guardian_request_duration_seconds', response.content)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_off_without_a_token(self):
+        self.assertEqual(self._scrape(HTTP_AUTHORIZATION='Bearer ').status_code, 404)
+
+    def test_shared_directory_adds_up_workers_and_keeps_exited_ones(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            metrics.observe('about', {'db': (0.002, 3)}, 0.01)
+            metrics.flush(force=True)
+            # Another worker on the host that has since exited.
+            other = {'histograms': [['about', 'total', [1] * (len(metrics.BUCKETS) + 2)]], 'queries': {'about': 4}}
+            with open(os.path.join(directory, 'worker-999999999-1.json'), 'w') as fh:
+                json.dump(other, fh)
+
+            histograms, queries = metrics._collect()
+            own = metrics._histograms[('about', 'total')][-1]
+            self.assertEqual(histograms[('about', 'total')][-1], own + 1)
+            self.assertEqual(queries['about'], metrics._query_counts['about'] + 4)
+            self.assertFalse(os.path.exists(os.path.join(directory, 'worker-999999999-1.json')))
+            # Folded into the exited file, so a later scrape still counts it.
+            self.assertEqual(metrics._collect()[1]['about'], queries['about'])
@@ -0,0 +1,39 @@
+import hashlib
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+
+class HashingUploadHandler(TemporaryFileUploadHandler):
+    """
+    Streams each uploaded file to a temporary file on disk, hashing it and
+    checking its size chunk by chunk as it arrives.
+
+    Files over MAX_UPLOAD_BYTES stop being written as soon as they cross the
+    limit and come back marked ``too_large`` for form validation to reject.
+    The resulting file carries ``sha256`` so storage can deduplicate it
+    without reading it again.
+    """
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+        self.bytes_written = 0
+        self.too_large = False
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.too_large:
+            return None
+        if self.bytes_written + len(raw_data) > settings.MAX_UPLOAD_BYTES:
+            self.too_large = True
+            self.file.truncate(0)
+            return None
+        self.hasher.update(raw_data)
+        self.bytes_written += len(raw_data)
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.too_large = self.too_large
+        file.sha256 = None if self.too_large else self.hasher.hexdigest()
+        return file
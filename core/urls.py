@@ -1,16 +1,23 @@
 
+from django.conf import settings
 from django.urls import path
+from . import api
 from . import views
+from . import async_views
+
+# Under ASGI the read paths and answer submission can run natively async.
+read_views = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
-    path('', views.home, name='home'),
-    path('public-questions/', views.public_questions, name='public_questions'),
+    path('', read_views.home, name='home'),
+    path('public-questions/', read_views.public_questions, name='public_questions'),
+    path('search/', views.search, name='search'),
     path('ask-public-question/', views.ask_public_question, name='ask_public_question'),
-    path('lawyers/', views.lawyers_list, name='lawyers_list'),
+    path('lawyers/', read_views.lawyers_list, name='lawyers_list'),
 
     path('register/', views.register_customer, name='register'),
     path('register-lawyer/', views.register_lawyer, name='register_lawyer'),
-    path('verify-email/<str:token>/', views.verify_email, name='verify_email'),
+    path('verify-email/<str:token>/', read_views.verify_email, name='verify_email'),
 
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
@@ -19,6 +26,11 @@ urlpatterns = [
     path('settings-lawyer/', views.settings_lawyer, name='settings_lawyer'),
     path('about/', views.about, name='about'),
     path('switch-language/', views.switch_language, name='switch_language'),
+    path('metrics/', views.metrics_view, name='metrics'),
+
+    path('answer/<int:pk>/', read_views.answer_question, name='answer_question'),
+    path('queue/', views.question_queue, name='question_queue'),
 
-    path('answer/<int:pk>/', views.answer_question, name='answer_question'),
+    path('api/questions/', api.questions, name='api_questions'),
+    path('api/lawyers/', api.lawyers, name='api_lawyers'),
 ]
@@ -1,24 +1,44 @@
+from django.http import Http404, HttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.core.mail import send_mail, EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.urls import reverse
+from django.utils.http import url_has_allowed_host_and_scheme
 from django.conf import settings
+from django.db import transaction
+from django.db.models import BigIntegerField, Q
 from django.contrib.auth import views as auth_views
+from django.core.exceptions import ValidationError
 
 from .models import PublicQuestion, LawyerProfile, CustomerProfile, VerificationToken
+from . import answering, duplicates, metrics, summary
+from .conditional import LAWYERS, QUESTIONS, conditional
+from .directory import DirectoryQuery
+from .language import get_language
+from .mail import queue_email
+from .pagecache import cache_anonymous_page
+from .ratelimit import ratelimit
+from .replicas import replica_reads
+from .search import search_questions
+from .storage import bar_certificate_storage, sendfile_response
 from .forms import (
     PublicQuestionForm,
     CustomerRegistrationForm,
     LawyerRegistrationForm,
     CustomerSettingsForm,
     LawyerSettingsForm,
+    QueuedPasswordResetForm,
+    validate_bar_certificate,
 )
 
+from datetime import datetime
 import secrets
+import hmac
+
+PUBLIC_QUESTIONS_PAGE_SIZE = 20
 
 
 # ----------------------
@@ -26,7 +46,7 @@ import secrets
 # ----------------------
 def _send_verification_email(request, user):
     """
-    Creates a one-time verification token and emails a link to the user.
+    Creates a one-time verification token and queues an email with a link to the user.
     Account remains inactive until they click the link.
     """
     token = secrets.token_hex(32)
@@ -38,14 +58,12 @@ def _send_verification_email(request, user):
     text_body = render_to_string('registration/verify_email.txt', context)
     html_body = render_to_string('registration/verify_email.html', context)
 
-    msg = EmailMultiAlternatives(subject, text_body, settings.DEFAULT_FROM_EMAIL, [user.email])
-    msg.attach_alternative(html_body, "text/html")
-    msg.send()
+    queue_email(subject, text_body, [user.email], html_body=html_body)
 
 
 def _notify_admin_lawyer_registration(user, specialty, years_experience, bar_number, request=None):
     """
-    Sends you an email when a lawyer signs up (for manual approval of bar cert etc.)
+    Queues an email to you when a lawyer signs up (for manual approval of bar cert etc.)
     Set ADMIN_REVIEW_EMAIL in env vars to receive this.
     """
     admin_email = getattr(settings, "ADMIN_REVIEW_EMAIL", "")
@@ -66,30 +84,90 @@ def _notify_admin_lawyer_registration(user, specialty, years_experience, bar_num
     #     lines.append(f"Certificate: {request.build_absolute_uri(user.lawyerprofile.bar_certificate.url)}")
 
     body = "\n".join(lines)
-    send_mail(
-        subject="New lawyer registration pending approval",
-        message=body,
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[admin_email],
-        fail_silently=True,
-    )
+    queue_email("New lawyer registration pending approval", body, [admin_email])
 
 
 # ------------
 # Public pages
 # ------------
+@replica_reads
+@conditional(QUESTIONS, LAWYERS)
+@cache_anonymous_page
 def home(request):
-    latest_questions = PublicQuestion.objects.filter(is_answered=True)[:5]
-    lawyers = LawyerProfile.objects.filter(approved=True)[:6]
-    return render(request, 'core/home.html', {'latest_questions': latest_questions, 'lawyers': lawyers})
+    return render(request, 'core/home.html', {'summary': summary.load()})
 
 
+def _decode_cursor(value):
+    """
+    Parses a keyset cursor of the form "<created_at isoformat>_<id>".
+    Returns None for missing or malformed cursors (i.e. start from the top).
+    """
+    created_at, sep, pk = (value or "").rpartition("_")
+    if not sep:
+        return None
+    try:
+        created_at, pk = datetime.fromisoformat(created_at), int(pk)
+    except ValueError:
+        return None
+    # An id no column can hold would fail in the database (DataError on PostgreSQL).
+    if not 0 < pk <= BigIntegerField.MAX_BIGINT:
+        return None
+    return created_at, pk
+
+
+def _encode_cursor(question):
+    return f"{question.created_at.isoformat()}_{question.pk}"
+
+
+def _public_questions_queryset(is_lawyer, cursor):
+    """One page (plus one look-ahead row) of the public question feed."""
+    questions = PublicQuestion.objects.select_related('answered_by__user').order_by('-created_at', '-id')
+    if not is_lawyer:
+        questions = questions.filter(is_answered=True)
+
+    # Keyset paging on (created_at, id): each page is a bounded index range scan
+    # instead of an OFFSET that grows with the archive. The OR alone cannot
+    # seek the index; the redundant created_at bound is what starts the scan
+    # at the cursor.
+    if cursor:
+        created_at, pk = cursor
+        questions = questions.filter(created_at__lte=created_at).filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+    return questions[:PUBLIC_QUESTIONS_PAGE_SIZE + 1]
+
+
+def _public_questions_context(questions, lawyer, cursor):
+    next_cursor = None
+    if len(questions) > PUBLIC_QUESTIONS_PAGE_SIZE:
+        questions = questions[:PUBLIC_QUESTIONS_PAGE_SIZE]
+        next_cursor = _encode_cursor(questions[-1])
+    return {
+        'questions': questions,
+        'is_lawyer': lawyer is not None,
+        'lawyer': lawyer,
+        'next_cursor': next_cursor,
+        'is_first_page': cursor is None,
+    }
+
+
+@replica_reads
+@conditional(QUESTIONS)
+@cache_anonymous_page
 def public_questions(request):
-    if request.user.is_authenticated and hasattr(request.user, 'lawyerprofile'):
-        questions = PublicQuestion.objects.all()
-    else:
-        questions = PublicQuestion.objects.filter(is_answered=True)
-    return render(request, 'core/public_questions.html', {'questions': questions})
+    lawyer = getattr(request.user, 'lawyerprofile', None)
+    cursor = _decode_cursor(request.GET.get('before'))
+    questions = list(_public_questions_queryset(lawyer is not None, cursor))
+    return render(request, 'core/public_questions.html', _public_questions_context(questions, lawyer, cursor))
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    is_lawyer = request.user.is_authenticated and hasattr(request.user, 'lawyerprofile')
+    results = []
+    if query:
+        results = search_questions(query, lang=get_language(request), answered_only=not is_lawyer)
+    return render(request, 'core/search.html', {'query': query, 'results': results, 'is_lawyer': is_lawyer})
 
 
 @login_required
@@ -98,39 +176,68 @@ def ask_public_question(request):
         messages.error(request, "Only customers can ask public questions.")
         return redirect('public_questions')
 
+    similar = []
     if request.method == "POST":
         form = PublicQuestionForm(request.POST)
         if form.is_valid():
-            q = form.save(commit=False)
-            q.name = request.user.username
-            q.email = request.user.email
-            q.save()
-            messages.success(request, "Your question has been submitted. Lawyers will review and answer.")
-            return redirect('public_questions')
+            # Offer existing answers first; the customer can still post anyway.
+            if not request.POST.get('post_anyway'):
+                similar = duplicates.similar_questions(form.cleaned_data['title'], form.cleaned_data['body'])
+            if not similar:
+                q = form.save(commit=False)
+                q.name = request.user.username
+                q.email = request.user.email
+                q.save()
+                messages.success(request, "Your question has been submitted. Lawyers will review and answer.")
+                return redirect('public_questions')
     else:
         form = PublicQuestionForm()
 
-    return render(request, 'core/ask_public_question.html', {'form': form})
+    return render(request, 'core/ask_public_question.html', {'form': form, 'similar': similar})
 
 
+@replica_reads
+@conditional(LAWYERS)
+@cache_anonymous_page
 def lawyers_list(request):
-    lawyers = LawyerProfile.objects.filter(approved=True)
-    return render(request, 'core/lawyers_list.html', {'lawyers': lawyers})
+    directory = DirectoryQuery(request.GET)
+    context = directory.context(list(directory.entries()), list(directory.specialties()))
+    return render(request, 'core/lawyers_list.html', context)
 
 
+@cache_anonymous_page
 def about(request):
     return render(request, 'core/about.html')
 
 
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. Needs the METRICS_TOKEN bearer token: behind a
+    same-host proxy every request comes from 127.0.0.1, so the address alone
+    proves nothing.
+    """
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if not settings.METRICS_TOKEN or not hmac.compare_digest(authorization, f'Bearer {settings.METRICS_TOKEN}'):
+        raise Http404
+    if settings.METRICS_ALLOWED_IPS and request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        raise Http404
+    return HttpResponse(metrics.render_prometheus(), content_type='text/plain; version=0.0.4')
+
+
 def switch_language(request):
-    # The language is stored by middleware from ?lang=en|fr; we just bounce back.
+    # The language cookie is set by middleware from ?lang=en|fr; we just bounce back,
+    # but only to a page on this site.
     next_url = request.GET.get('next', '/')
+    if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()},
+                                           require_https=request.is_secure()):
+        next_url = '/'
     return redirect(next_url)
 
 
 # ------------------
 # Authentication/Reg
 # ------------------
+@ratelimit('register', field='username')
 def register_customer(request):
     if request.method == "POST":
         form = CustomerRegistrationForm(request.POST)
@@ -145,19 +252,21 @@ def register_customer(request):
     return render(request, 'core/register.html', {'form': form})
 
 
+@ratelimit('register', field='username')
 def register_lawyer(request):
     if request.method == "POST":
         form = LawyerRegistrationForm(request.POST, request.FILES)
         if form.is_valid():
-            user = form.save()
-            lp = LawyerProfile.objects.create(
-                user=user,
-                specialty=form.cleaned_data['specialty'],
-                years_experience=form.cleaned_data['years_experience'],
-                bar_number=form.cleaned_data['bar_number'],
-                bar_certificate=form.cleaned_data['bar_certificate'],
-                approved=False,
-            )
+            with transaction.atomic():
+                user = form.save()
+                lp = LawyerProfile.objects.create(
+                    user=user,
+                    specialty=form.cleaned_data['specialty'],
+                    years_experience=form.cleaned_data['years_experience'],
+                    bar_number=form.cleaned_data['bar_number'],
+                    bar_certificate=form.cleaned_data['bar_certificate'],
+                    approved=False,
+                )
             _send_verification_email(request, user)
             _notify_admin_lawyer_registration(user, lp.specialty, lp.years_experience, lp.bar_number, request=request)
             messages.success(
@@ -173,11 +282,16 @@ def register_lawyer(request):
 
 def verify_email(request, token):
     try:
-        vt = VerificationToken.objects.get(token=token)
+        vt = VerificationToken.objects.select_related('user').get(token=token)
     except VerificationToken.DoesNotExist:
         messages.error(request, "Invalid or expired verification link.")
         return redirect('login')
 
+    if vt.is_expired:
+        # Left in place so purge_verification_tokens also removes the unverified account.
+        messages.error(request, "Invalid or expired verification link.")
+        return redirect('login')
+
     user = vt.user
     user.is_active = True
     user.save()
@@ -187,6 +301,7 @@ def verify_email(request, token):
     return redirect('login')
 
 
+@ratelimit('login', field='username')
 def login_view(request):
     if request.method == "POST":
         username = request.POST.get("username", "").strip()
@@ -245,7 +360,16 @@ def settings_lawyer(request):
     if request.method == "POST":
         form = LawyerSettingsForm(request.POST, instance=request.user)
         if form.is_valid():
-            form.save()
+            # Check the upload before writing anything, so a rejected file
+            # doesn't leave the account half updated.
+            certificate = request.FILES.get("bar_certificate")
+            if certificate:
+                try:
+                    validate_bar_certificate(certificate)
+                except ValidationError as e:
+                    messages.error(request, e.messages[0])
+                    return redirect('settings_lawyer')
+                lp.bar_certificate = certificate
 
             lp.specialty = request.POST.get("specialty", lp.specialty)
             try:
@@ -253,15 +377,15 @@ def settings_lawyer(request):
             except Exception:
                 pass
 
-            if request.FILES.get("bar_certificate"):
-                lp.bar_certificate = request.FILES["bar_certificate"]
-
-            lp.save()
-
             new_password = request.POST.get("new_password")
+            with transaction.atomic():
+                user = form.save(commit=False)
+                if new_password:
+                    user.set_password(new_password)
+                user.save()
+                lp.save()
+
             if new_password:
-                request.user.set_password(new_password)
-                request.user.save()
                 messages.success(request, "Settings saved. Please log in again with your new password.")
                 return redirect('login')
 
@@ -279,38 +403,102 @@ def settings_lawyer(request):
 # -------------------------
 # Lawyer answering workflow
 # -------------------------
+CLAIM_ERRORS = {
+    answering.ANSWERED: "This question has already been answered.",
+    answering.TAKEN: "Another lawyer is answering this question right now.",
+    answering.MISSING: "This question no longer exists.",
+}
+
+
 @login_required
 def answer_question(request, pk):
-    if not hasattr(request.user, 'lawyerprofile'):
+    lawyer = getattr(request.user, 'lawyerprofile', None)
+    if lawyer is None:
         messages.error(request, "Only lawyers can answer questions.")
         return redirect('public_questions')
 
-    q = get_object_or_404(PublicQuestion, pk=pk)
-
     if request.method == "POST":
+        if 'release' in request.POST:
+            answering.release(pk, lawyer)
+            return redirect('public_questions')
         answer_text = request.POST.get("answer_text", "").strip()
-        if not answer_text:
-            messages.error(request, "Answer cannot be empty.")
-        else:
-            q.answer_text = answer_text
-            q.is_answered = True
-            q.answered_by = request.user.lawyerprofile
-            q.save()
-            messages.success(request, "Answer posted.")
+        if answer_text:
+            if answering.submit_answer(pk, lawyer, answer_text):
+                messages.success(request, "Answer posted.")
+            else:
+                messages.error(request, "Another lawyer answered or took over this question first.")
             return redirect('public_questions')
+        messages.error(request, "Answer cannot be empty.")
 
-    return render(request, 'core/answer_question.html', {'q': q})
+    q = get_object_or_404(PublicQuestion, pk=pk)
+    outcome = answering.claim(pk, lawyer)
+    if outcome != answering.CLAIMED:
+        messages.error(request, CLAIM_ERRORS[outcome])
+        return redirect('public_questions')
+    return render(request, 'core/answer_question.html', {'q': q, 'claim_minutes': settings.ANSWER_CLAIM_MINUTES})
+
+
+@login_required
+def question_queue(request):
+    """
+    Oldest unanswered questions routed to the lawyer's specialty, or the
+    general queue for questions asked without one. POST claims the next
+    free question and opens its answer form.
+    """
+    lawyer = getattr(request.user, 'lawyerprofile', None)
+    if lawyer is None:
+        messages.error(request, "Only lawyers can answer questions.")
+        return redirect('public_questions')
+
+    own_specialty = answering.routed_specialty(lawyer)
+    general = own_specialty is None or request.GET.get('queue') == 'general'
+    specialty = None if general else own_specialty
+
+    if request.method == "POST":
+        question = answering.claim_next(lawyer, specialty)
+        if question is None:
+            messages.error(request, "There are no free questions left in this queue.")
+            return redirect(request.get_full_path())
+        return redirect('answer_question', pk=question.pk)
+
+    cursor = _decode_cursor(request.GET.get('after'))
+    questions = list(answering.pending(specialty, cursor))
+    next_cursor = None
+    if len(questions) > answering.QUEUE_PAGE_SIZE:
+        questions = questions[:answering.QUEUE_PAGE_SIZE]
+        next_cursor = _encode_cursor(questions[-1])
+    return render(request, 'core/question_queue.html', {
+        'questions': questions,
+        'lawyer': lawyer,
+        'own_specialty': own_specialty,
+        'general': general,
+        'next_cursor': next_cursor,
+        'is_first_page': cursor is None,
+    })
+
+
+@login_required
+def bar_certificate(request, name):
+    """
+    Serves an uploaded bar certificate to staff and to the lawyer who owns it.
+    """
+    name = f'bar_certificates/{name}'
+    if not request.user.is_staff and not LawyerProfile.objects.filter(user=request.user, bar_certificate=name).exists():
+        raise Http404
+    return sendfile_response(bar_certificate_storage(), name)
 
 
 # --------------------------
 # Password reset (built-ins)
 # --------------------------
+@ratelimit('password_reset', field='email')
 def password_reset_request(request):
     """
-    Sends the password reset email using Django's built-in view,
+    Queues the password reset email using Django's built-in view,
     with our custom templates.
     """
     return auth_views.PasswordResetView.as_view(
+        form_class=QueuedPasswordResetForm,
         template_name='registration/password_reset_form.html',
         email_template_name='registration/password_reset_email.html',
         subject_template_name='registration/password_reset_subject.txt',
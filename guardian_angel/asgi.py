@@ -1,4 +1,18 @@
+"""
+ASGI entry point.
 
+Run with native async read views (core.async_views):
+
+    pip install uvicorn
+    ASYNC_VIEWS=True uvicorn guardian_angel.asgi:application --workers 4
+
+or under gunicorn's process manager:
+
+    ASYNC_VIEWS=True gunicorn guardian_angel.asgi:application -k uvicorn.workers.UvicornWorker -w 4
+
+The WSGI deployment stays `gunicorn guardian_angel.wsgi`. Compare the two with
+`python manage.py benchmark_concurrency http://127.0.0.1:8000/ --slow-client-delay 0.05`.
+"""
 import os
 from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'guardian_angel.settings')
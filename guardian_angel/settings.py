@@ -1,7 +1,8 @@
-
 import os
+import sys
 from pathlib import Path
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -25,6 +26,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -40,10 +42,17 @@ ROOT_URLCONF = 'guardian_angel.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backend.DjangoTemplates',
         'DIRS': [BASE_DIR / 'core' / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Cached in every environment, so DEBUG renders the way production
+            # does; the autoreloader still clears it when a template changes.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -56,10 +65,112 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'guardian_angel.wsgi.application'
+ASGI_APPLICATION = 'guardian_angel.asgi.application'
 
+# Route home, public_questions, lawyers_list, verify_email and answer_question to
+# their native async versions (core.async_views). Only worth it under ASGI.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
+
+# Database connections. DB_CONN_MAX_AGE keeps each worker's connection open
+# for that many seconds instead of reconnecting on every request (0 closes it
+# after each request). DB_CONN_HEALTH_CHECKS pings a reused connection before
+# a request's first query so one dropped by the server is replaced instead of
+# failing the request.
+#
+# Under ASGI, prefer DB_CONN_MAX_AGE=0: async views run their queries on
+# short-lived threads that would each keep a connection open.
+#
+# Compare the settings with `python manage.py benchmark_connections`.
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', '60'))
+DB_CONN_HEALTH_CHECKS = os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True'
 DATABASES = {
-    'default': dj_database_url.config(default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}")
+    'default': dj_database_url.config(
+        default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}",
+        conn_max_age=DB_CONN_MAX_AGE,
+        conn_health_checks=DB_CONN_HEALTH_CHECKS,
+    )
+}
+
+# Read replicas (core.replicas). DATABASE_REPLICA_URLS is a comma-separated
+# list of database URLs, configured as replica1, replica2, ... The public
+# read-only views (home, public_questions, lawyers_list, the JSON API) read
+# from a replica; everything else uses the primary. A client that writes
+# reads from the primary for the next REPLICA_PIN_SECONDS. A replica whose
+# heartbeat is more than REPLICA_MAX_LAG_SECONDS old is skipped, so run
+# `python manage.py replica_heartbeat --loop` against the primary. Each
+# worker rechecks a replica's lag every REPLICA_LAG_CHECK_SECONDS.
+#
+# To try it locally with SQLite: `python manage.py replica_heartbeat`, copy
+# db.sqlite3 to replica.sqlite3 and set DATABASE_REPLICA_URLS=sqlite:///replica.sqlite3.
+# Reads use the copy until it is REPLICA_MAX_LAG_SECONDS stale (or until
+# you copy it again).
+DATABASE_REPLICA_URLS = [u.strip() for u in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if u.strip()]
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '10'))
+REPLICA_MAX_LAG_SECONDS = float(os.getenv('REPLICA_MAX_LAG_SECONDS', '5'))
+REPLICA_LAG_CHECK_SECONDS = float(os.getenv('REPLICA_LAG_CHECK_SECONDS', '1'))
+for number, url in enumerate(DATABASE_REPLICA_URLS, 1):
+    DATABASES[f'replica{number}'] = dj_database_url.parse(
+        url, conn_max_age=DB_CONN_MAX_AGE, conn_health_checks=DB_CONN_HEALTH_CHECKS,
+        # Tests read the primary through the replica aliases.
+        test_options={'MIRROR': 'default'},
+    )
+if not DATABASE_REPLICA_URLS and sys.argv[1:2] == ['test']:
+    # The test suite checks the routing against a replica alias that mirrors
+    # the test database (core.tests.ReplicaRoutingTests enables the router).
+    DATABASES['replica1'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+if DATABASE_REPLICA_URLS:
+    DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+    MIDDLEWARE.insert(MIDDLEWARE.index('django.contrib.sessions.middleware.SessionMiddleware'),
+                      'core.middleware.ReplicaPinningMiddleware')
+
+# Cache — local memory by default (bounded, LRU-culled). Set CACHE_BACKEND to
+# django.core.cache.backends.redis.RedisCache or .filebased.FileBasedCache and
+# CACHE_LOCATION to share the cache between workers.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+if CACHE_BACKEND.endswith(('LocMemCache', 'FileBasedCache')):
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '1000'))}
+
+# Sessions — plain database sessions unless SESSION_CACHE_BACKEND is a cache
+# every worker shares (Redis or Memcached), in which case cached_db with a
+# capped cache lifetime (core.sessions) spares authenticated requests their
+# session SELECT. A per-process or per-host cache would let other workers
+# keep accepting a session after it was logged out, so it is never picked by
+# default; setting SESSION_ENGINE explicitly overrides the choice (e.g.
+# django.contrib.sessions.backends.signed_cookies).
+# Expired rows are removed by `python manage.py sweep_sessions --loop`.
+SESSION_CACHE_BACKEND = os.getenv('SESSION_CACHE_BACKEND', CACHE_BACKEND)
+SESSION_CACHE_SHARED = SESSION_CACHE_BACKEND.endswith(('RedisCache', 'PyMemcacheCache', 'PyLibMCCache'))
+SESSION_ENGINE = os.getenv(
+    'SESSION_ENGINE', 'core.sessions' if SESSION_CACHE_SHARED else 'django.contrib.sessions.backends.db',
+)
+SESSION_CACHE_ALIAS = 'sessions'
+SESSION_CACHE_MAX_AGE = int(os.getenv('SESSION_CACHE_MAX_AGE', '60'))
+if SESSION_CACHE_BACKEND.endswith('FileBasedCache'):
+    # Never the page cache's directory: clearing or culling one would empty the other.
+    default_location = CACHES['default']['LOCATION'] if CACHE_BACKEND.endswith('FileBasedCache') else ''
+    SESSION_CACHE_LOCATION = os.getenv('SESSION_CACHE_LOCATION',
+                                       f"{default_location.rstrip('/')}-sessions" if default_location else '')
+    if not SESSION_CACHE_LOCATION or SESSION_CACHE_LOCATION.rstrip('/') == default_location.rstrip('/'):
+        raise ImproperlyConfigured("SESSION_CACHE_LOCATION must be a directory of its own for FileBasedCache.")
+else:
+    SESSION_CACHE_LOCATION = os.getenv('SESSION_CACHE_LOCATION', CACHES['default']['LOCATION'] or 'sessions')
+CACHES['sessions'] = {
+    'BACKEND': SESSION_CACHE_BACKEND,
+    'LOCATION': SESSION_CACHE_LOCATION,
+    'KEY_PREFIX': 'sessions',
 }
+if SESSION_CACHE_BACKEND.endswith(('LocMemCache', 'FileBasedCache')):
+    CACHES['sessions']['OPTIONS'] = {'MAX_ENTRIES': int(os.getenv('SESSION_CACHE_MAX_ENTRIES', '10000'))}
+
+# Anonymous page cache (core.pagecache)
+PAGE_CACHE_ALIAS = 'default'
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', '300'))
 
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -68,7 +179,19 @@ AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator'},
 ]
 
-LANGUAGE_CODE = 'en-us'
+LANGUAGE_CODE = 'en'
+# Interface strings are translated through core/locale; after editing a
+# template, run `makemessages -l fr` and `compilemessages`.
+LANGUAGES = [
+    ('en', 'English'),
+    ('fr', 'Français'),
+]
+
+# The site language (en/fr) is kept in this signed cookie rather than the
+# session; see core.language.
+LANGUAGE_COOKIE_NAME = 'lang'
+LANGUAGE_COOKIE_AGE = 365 * 24 * 60 * 60
+LANGUAGE_COOKIE_SAMESITE = 'Lax'
 TIME_ZONE = 'America/Toronto'
 USE_I18N = True
 USE_TZ = True
@@ -76,13 +199,36 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'core' / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# Templates only ever reference fingerprinted names, which whitenoise serves
+# with a far-future immutable Cache-Control; drop the unhashed copies.
+WHITENOISE_KEEP_ONLY_HASHED_FILES = True
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    # Minified, fingerprinted and precompressed; see core.staticfiles.
+    'staticfiles': {'BACKEND': 'core.staticfiles.StaticFilesStorage'},
+    # Content-addressed so identical certificates are stored once.
+    'bar_certificates': {'BACKEND': os.getenv('BAR_CERTIFICATE_STORAGE', 'core.storage.ContentAddressedStorage')},
+}
+
+# Uploads stream to disk in chunks and are hashed/size-checked on the way in.
+FILE_UPLOAD_HANDLERS = ['core.uploads.HashingUploadHandler']
+MAX_UPLOAD_BYTES = int(os.getenv('MAX_UPLOAD_BYTES', str(10 * 1024 * 1024)))
+
+# How private media is handed to the front-end server: '' (FileResponse via
+# sendfile), 'x-accel-redirect' (nginx, internal location at SENDFILE_URL_PREFIX)
+# or 'x-sendfile' (Apache/lighttpd; storages without local paths are streamed).
+SENDFILE_MODE = os.getenv('SENDFILE_MODE', '')
+SENDFILE_URL_PREFIX = os.getenv('SENDFILE_URL_PREFIX', '/protected-media/')
+
 # Email (SMTP) — configure via env vars on Render
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Set EMAIL_BACKEND to django.core.mail.backends.console.EmailBackend (or filebased
+# with EMAIL_FILE_PATH) to run the queue worker without a mail server.
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_FILE_PATH = os.getenv('EMAIL_FILE_PATH', str(BASE_DIR / 'sent_emails'))
 EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
 EMAIL_PORT = int(os.getenv('EMAIL_PORT', '25'))
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
@@ -92,8 +238,64 @@ EMAIL_USE_SSL = os.getenv('EMAIL_USE_SSL', 'False') == 'True'
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'no-reply@guardianangel.local')
 ADMIN_REVIEW_EMAIL = os.getenv('ADMIN_REVIEW_EMAIL', '')  # notify you for lawyer registrations
 
+# Outbound email queue — drained by `python manage.py send_queued_email --loop`
+EMAIL_QUEUE_MAX_ATTEMPTS = int(os.getenv('EMAIL_QUEUE_MAX_ATTEMPTS', '5'))
+EMAIL_QUEUE_RETRY_BASE_SECONDS = int(os.getenv('EMAIL_QUEUE_RETRY_BASE_SECONDS', '60'))
+EMAIL_QUEUE_RETRY_MAX_SECONDS = int(os.getenv('EMAIL_QUEUE_RETRY_MAX_SECONDS', '3600'))
+# A worker leases the emails it is sending for this long; if it dies, they
+# are retried once the lease runs out.
+EMAIL_QUEUE_LEASE_SECONDS = int(os.getenv('EMAIL_QUEUE_LEASE_SECONDS', '300'))
+
+# Email verification links stop working after this many hours; run
+# `python manage.py purge_verification_tokens` periodically to clean up.
+VERIFICATION_TOKEN_TTL_HOURS = int(os.getenv('VERIFICATION_TOKEN_TTL_HOURS', '48'))
+
+# Opening the answer form reserves the question for this many minutes so
+# other lawyers skip it; an answer is still accepted after the lease lapses
+# as long as nobody else has answered first.
+ANSWER_CLAIM_MINUTES = int(os.getenv('ANSWER_CLAIM_MINUTES', '15'))
+
+# Token-bucket throttling of login, registration and password reset POSTs
+# (core.ratelimit), keyed on client IP and submitted username/email.
+# scope: (burst size, tokens refilled per minute)
+RATE_LIMITS = {
+    'login': (10, 5),
+    'register': (5, 1),
+    'password_reset': (5, 1),
+}
+RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', 'True') == 'True'
+RATELIMIT_CACHE_ALIAS = 'default'
+# Only enable behind a proxy that sets X-Forwarded-For; otherwise clients can spoof it.
+RATELIMIT_TRUST_X_FORWARDED_FOR = os.getenv('RATELIMIT_TRUST_X_FORWARDED_FOR', 'False') == 'True'
+
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'
 LOGOUT_REDIRECT_URL = 'home'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Request instrumentation (core.middleware.ServerTimingMiddleware)
+SERVER_TIMING_HEADER = os.getenv('SERVER_TIMING_HEADER', 'True') == 'True'
+# /metrics/ answers only with "Authorization: Bearer <METRICS_TOKEN>" (it is
+# off while the token is empty), optionally also only to METRICS_ALLOWED_IPS.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.getenv('METRICS_ALLOWED_IPS', '').split(',') if ip.strip()]
+# With more than one worker process, point METRICS_DIR at a directory the
+# workers share (cleared on restart) so /metrics/ reports all of them.
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', '5'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.requests': {
+            'handlers': ['console'],
+            'level': os.getenv('REQUEST_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
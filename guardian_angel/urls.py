@@ -1,8 +1,6 @@
 
 from django.contrib import admin
 from django.urls import path, include
-from django.conf import settings
-from django.conf.urls.static import static
 from core import views as core_views
 
 urlpatterns = [
@@ -13,4 +11,7 @@ urlpatterns = [
     path('password-reset/done/', core_views.password_reset_done_view, name='password_reset_done'),
     path('reset/<uidb64>/<token>/', core_views.password_reset_confirm_view, name='password_reset_confirm'),
     path('reset/done/', core_views.password_reset_complete_view, name='password_reset_complete'),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    # Uploaded certificates are private: served by a permission-checking view
+    # that hands the bytes to sendfile / the front-end server.
+    path('media/bar_certificates/<path:name>', core_views.bar_certificate, name='bar_certificate'),
+]